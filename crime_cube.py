@@ -0,0 +1,178 @@
+# CMPT 353 - Final Project
+# Authors: Benley Hsiang
+#          April Nguyen
+#          Gia Hue (Hayden) Mai
+#
+# Description: Crime counts per census tract x year x month x hour of day x crime type ("cube"), built by the ETL
+#              so questions like "night-time break-ins per tract in 2019 vs 2021" don't need the raw archives.
+#              The ETL already loads the cleaned crimes of every year (data_processing.py) or streams them into
+#              partitions (partitioned_etl.py), matches them to their nearest census tract and counts them with
+#              count_cells, so the cube costs no extra pass over the crime data.
+#              The cube is sparse: only the non-zero cells are stored, as small integer codes into the label
+#              arrays of each axis, in crime_census/crime_cube_{city}.npz. The tracts' 2021 population is stored
+#              with it so crime rates can be calculated for any slice, e.g.
+#                   cube = load_cube('van')
+#                   query_cube(cube, years = [2019], hours = [22, 23, 0, 1, 2, 3, 4, 5], types = ['Break and Enter Residential/Other'])
+#                   crime_rate(cube, years = [2021])        # same as crime_rate in crime_census_van.geojson
+#              Month and hour are -1 when not recorded (e.g. Montreal has no hour), and crime types differ
+#              between cities. Asking for labels a city doesn't have raises an error (or a warning if only
+#              some of them are missing) instead of returning counts of 0.
+#
+# crime_cube.py
+# Last modified: October 19, 2026
+
+import pathlib
+import warnings
+import numpy as np
+import pandas as pd
+
+axes = ['tract', 'year', 'month', 'hour', 'type']
+cube_dir = pathlib.Path('crime_census')
+
+
+# Description: Counts crimes per cell of the cube (tract, year, month, hour, type)
+# Precondition: crimes has the type, year, month and hour columns kept by data_processing.clean_crimes,
+#               tracts is the census tract name of each crime (NaN for crimes without a tract)
+# Returns a Series of the counts of the non-zero cells, indexed by the axes
+def count_cells(crimes, tracts):
+    cells = pd.DataFrame({'tract' : np.asarray(tracts, dtype = object),
+                          # Integers whether they come from the crime store or a raw archive (e.g. Toronto's float years)
+                          'year' : crimes['year'].to_numpy().astype(np.int16),
+                          'month' : crimes['month'].to_numpy().astype(np.int16),
+                          'hour' : crimes['hour'].to_numpy().astype(np.int16),
+                          'type' : crimes['type'].astype(object).fillna('Unknown').to_numpy()})
+    return cells.dropna(subset = ['tract']).groupby(axes).size()
+
+
+# Description: Builds a city's cube from its crimes of every year
+# Precondition: census is the city's census projected in the city's EPSG, crimes are the city's cleaned crimes
+#               (data_processing.load_crimes with year = None), tracts is an optional Series of the tract of
+#               each crime (data_processing.assign_tracts), found here if not given
+# Returns the cube as a dict (see load_cube)
+def build_cube(city, census, crimes, tracts = None):
+    if tracts is None:
+        # imported here because data_processing imports this module
+        from data_processing import assign_tracts
+        tracts = assign_tracts(crimes, census)
+    return cube_from_counts(city, census, [count_cells(crimes, tracts)])
+
+
+# Description: Builds a city's cube from counts of count_cells, e.g. one Series per partition of partitioned_etl.py
+# Returns the cube as a dict (see load_cube)
+def cube_from_counts(city, census, parts):
+    parts = [part for part in parts if len(part)]
+    if parts:
+        counts = pd.concat(parts).groupby(level = axes).sum()
+    else:
+        counts = pd.Series(dtype = np.int64, index = pd.MultiIndex.from_arrays([[]] * len(axes), names = axes))
+
+    # Every tract of the census is on the tract axis, including those without crimes
+    # (text labels as fixed-width numpy strings so the .npz file doesn't need pickle)
+    labels = {'tract' : census['name'].to_numpy(dtype = str)}
+    for axis in axes[1:]:
+        labels[axis] = np.sort(counts.index.get_level_values(axis).unique().to_numpy())
+    for axis in ['year', 'month', 'hour']:
+        labels[axis] = labels[axis].astype(np.int16)
+    labels['type'] = labels['type'].astype(str)
+
+    coords = {}
+    for axis in axes:
+        codes = pd.Index(labels[axis]).get_indexer(counts.index.get_level_values(axis))
+        coords[axis] = codes.astype(np.min_scalar_type(max(len(labels[axis]) - 1, 0)))
+
+    return {'city' : city,
+            'counts' : counts.values.astype(np.int32),
+            'coords' : coords,
+            'labels' : labels,
+            'population' : census['pop_21'].astype(float).values}
+
+
+# Description: Saves a cube as crime_cube_{city}.npz (uncompressed so it loads quickly)
+def save_cube(cube, output_dir = cube_dir):
+    arrays = {'counts' : cube['counts'], 'population' : cube['population']}
+    for axis in axes:
+        arrays[axis] = cube['coords'][axis]
+        arrays[axis + '_labels'] = cube['labels'][axis]
+    np.savez(output_dir / ('crime_cube_' + cube['city'] + '.npz'), **arrays)
+
+
+# Description: Loads the cube of a city saved by the ETL
+# Returns a dict with
+#   counts      number of crimes of every non-zero cell
+#   coords      {axis: code of every non-zero cell on that axis}
+#   labels      {axis: labels of the axis}, codes index into them
+#   population  2021 population of every tract (same order as labels['tract'])
+def load_cube(city, input_dir = cube_dir):
+    with np.load(input_dir / ('crime_cube_' + city + '.npz')) as data:
+        return {'city' : city,
+                'counts' : data['counts'],
+                'coords' : {axis: data[axis] for axis in axes},
+                'labels' : {axis: data[axis + '_labels'] for axis in axes},
+                'population' : data['population']}
+
+
+# Description: Counts crimes in a slice of the cube and rolls them up onto the axes in `by`
+# Precondition: years, months, hours, types, tracts are optional lists of labels to keep (None keeps everything)
+#               by is an axis name or a list of them
+# Returns a Series of counts indexed by the labels of `by`
+#         (every label for a single axis, only non-zero combinations for several axes)
+#         Raises ValueError if none of the labels asked for on an axis are in the city's data (e.g. an hour
+#         in Montreal), and warns if only some of them are missing (e.g. crime types of several cities)
+def query_cube(cube, years = None, months = None, hours = None, types = None, tracts = None, by = 'tract'):
+    keep = np.ones(len(cube['counts']), dtype = bool)
+    for axis, wanted in [('year', years), ('month', months), ('hour', hours), ('type', types), ('tract', tracts)]:
+        if wanted is None:
+            continue
+        # Compared as they are: casting them to the labels' fixed-width dtype would cut longer names short
+        # (and years like 2019.5 to 2019) so they would match the wrong label
+        wanted = list(wanted)
+        # Lookup table over the (short) axis, then one gather over the cells
+        in_slice = pd.Index(cube['labels'][axis]).isin(wanted)
+        found = set(cube['labels'][axis][in_slice].tolist())
+        missing = [label for label in wanted if label not in found]
+        if len(missing) == len(wanted):
+            raise ValueError(f'{cube["city"]} has no crimes with {axis} {missing}')
+        if missing:
+            warnings.warn(f'{cube["city"]} has no crimes with {axis} {missing}, counting the others')
+
+        keep &= in_slice[cube['coords'][axis]]
+
+    counts = cube['counts'][keep]
+
+    if isinstance(by, str):
+        totals = np.bincount(cube['coords'][by][keep], weights = counts, minlength = len(cube['labels'][by]))
+        return pd.Series(totals.astype(np.int64), index = pd.Index(cube['labels'][by], name = by), name = 'crime_count')
+
+    sizes = [len(cube['labels'][axis]) for axis in by]
+    flat = np.ravel_multi_index([cube['coords'][axis][keep] for axis in by], sizes)
+    cells, inverse = np.unique(flat, return_inverse = True)
+    totals = np.bincount(inverse, weights = counts, minlength = len(cells)).astype(np.int64)
+    index = pd.MultiIndex.from_arrays([cube['labels'][axis][codes] for axis, codes in zip(by, np.unravel_index(cells, sizes))],
+                                      names = by)
+    return pd.Series(totals, index = index, name = 'crime_count')
+
+
+# Description: Crime rate (crimes per resident) of every tract for a slice of the cube
+# Precondition: same slice arguments as query_cube
+# Returns a Series indexed by tract name, NaN for tracts without population
+def crime_rate(cube, years = None, months = None, hours = None, types = None):
+    counts = query_cube(cube, years = years, months = months, hours = hours, types = types)
+    population = np.where(cube['population'] > 0, cube['population'], np.nan)
+    return (counts / population).rename('crime_rate')
+
+
+# Description: Replaces crime_rate in crime_census data with the rate of a slice of the cubes
+# Precondition: crime_census is a dict of {city: GeoDataFrame}, the cubes of those cities were built by the ETL
+#               crime_slice is a dict of query_cube arguments (years, months, hours, types)
+# Returns a new dict of {city: GeoDataFrame}, without the cities that don't record the slice (with a warning)
+def apply_slice(crime_census, crime_slice, input_dir = cube_dir):
+    sliced = {}
+    for city, data in crime_census.items():
+        try:
+            rate = crime_rate(load_cube(city, input_dir), **crime_slice)
+        except ValueError as error:
+            warnings.warn(f'{error}, {city} is left out of the slice')
+            continue
+        sliced[city] = data.copy()
+        sliced[city]['crime_rate'] = sliced[city]['name'].map(rate)
+    return sliced
@@ -29,6 +29,8 @@ from sklearn.neighbors import KNeighborsRegressor
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.inspection import permutation_importance
+# Features the models are trained on (registry in data_processing.py)
+from data_processing import feature_cols
 
 OUTPUT_TEMPLATE = (                
     'Gaussian Regressor:           {gauss:.3f}\n'
@@ -37,29 +39,62 @@ OUTPUT_TEMPLATE = (
     'Gradient Boosting Regressor:  {grad_b:.3f}\n'
 )
 
-def main():
+
+# Description: Creates the four models, keyed the same way as OUTPUT_TEMPLATE
+# Precondition: seed is an optional random_state for the random forest and gradient boosting models
+# Returns a dict of {name: unfitted pipeline}
+def make_models(seed=None):
+    # Gaussian Process Regressor
+    gauss_model = make_pipeline(
+        StandardScaler(), 
+        GaussianProcessRegressor()
+    )
+    
+    # k-Nearest Neighbors Regressor
+    kNN_model = make_pipeline(
+        StandardScaler(), 
+        KNeighborsRegressor(n_neighbors = 6) # Needs tweaking
+    )
+
+    # Random Forest Regressor
+    randforest_model = make_pipeline(
+        StandardScaler(), 
+        RandomForestRegressor(n_estimators = 400, max_depth = 15, min_samples_leaf = 10, random_state = seed) # Needs tweaking
+    )
+    
+    # Gradient boosting Regressor
+    grad_boost_model = make_pipeline(
+        StandardScaler(), 
+        GradientBoostingRegressor(n_estimators = 300, max_depth = 15, min_samples_leaf = 10, random_state = seed) # Needs tweaking
+    )
+
+    return {'gauss' : gauss_model, 'kNN' : kNN_model, 'rand_f' : randforest_model, 'grad_b' : grad_boost_model}
+
+
+# Precondition: crime_census is an optional dict of {city: GeoDataFrame} that was already loaded
+#               (e.g. by run_analysis.py), otherwise the crime_census_{city}.geojson files are read
+def main(crime_census=None):
     # Reading the GeoJSON file
-    input_dir = pathlib.Path('crime_census')
-    vancouver = gpd.read_file(input_dir / 'crime_census_van.geojson')
-    toronto = gpd.read_file(input_dir / 'crime_census_tor.geojson')
-    montreal = gpd.read_file(input_dir / 'crime_census_mon.geojson')
+    if crime_census is not None:
+        vancouver = crime_census['van']
+        toronto = crime_census['tor']
+        montreal = crime_census['mon']
+    else:
+        input_dir = pathlib.Path('crime_census')
+        vancouver = gpd.read_file(input_dir / 'crime_census_van.geojson')
+        toronto = gpd.read_file(input_dir / 'crime_census_tor.geojson')
+        montreal = gpd.read_file(input_dir / 'crime_census_mon.geojson')
         
     # Setting columns for vancouver data    
-    X_van = vancouver[['pop_density', 'dropouts_to_grads', 'one_parent_to_two', 'crowded_to_not', 
-                'children_to_adults', 'non_minority_to_minority', 'male_to_female',
-                'divorce_rate', 'home_renters_to_owners', 'low_income_status_pct']]
+    X_van = vancouver[feature_cols]
     y_van = vancouver['crime_rate']
     
     # Setting columns for toronto data    
-    X_tor = toronto[['pop_density', 'dropouts_to_grads', 'one_parent_to_two', 'crowded_to_not', 
-                'children_to_adults', 'non_minority_to_minority', 'male_to_female',
-                'divorce_rate', 'home_renters_to_owners', 'low_income_status_pct']]
+    X_tor = toronto[feature_cols]
     y_tor = toronto['crime_rate']
         
     # Setting columns for montreal data    
-    X_mon = montreal[['pop_density', 'dropouts_to_grads', 'one_parent_to_two', 'crowded_to_not', 
-                'children_to_adults', 'non_minority_to_minority', 'male_to_female',
-                'divorce_rate', 'home_renters_to_owners', 'low_income_status_pct']]
+    X_mon = montreal[feature_cols]
     y_mon = montreal['crime_rate']
 
     # Partitioning the data
@@ -81,29 +116,8 @@ def main():
     y_valid_van_tor = pd.concat([y_valid_van, y_valid_tor])
     y_valid_cities = pd.concat([y_valid_van_tor, y_valid_mon])
     
-    # Gaussian Process Regressor
-    gauss_model = make_pipeline(
-        StandardScaler(), 
-        GaussianProcessRegressor()
-    )
-    
-    # k-Nearest Neighbors Regressor
-    kNN_model = make_pipeline(
-        StandardScaler(), 
-        KNeighborsRegressor(n_neighbors = 6) # Needs tweaking
-    )
-
-    # Random Forest Regressor
-    randforest_model = make_pipeline(
-        StandardScaler(), 
-        RandomForestRegressor(n_estimators = 400, max_depth = 15, min_samples_leaf = 10) # Needs tweaking
-    )
-    
-    # Gradient boosting Regressor
-    grad_boost_model = make_pipeline(
-        StandardScaler(), 
-        GradientBoostingRegressor(n_estimators = 300, max_depth = 15, min_samples_leaf = 10) # Needs tweaking
-    )
+    # Gaussian Process, k-Nearest Neighbors, Random Forest, and Gradient boosting Regressors
+    gauss_model, kNN_model, randforest_model, grad_boost_model = make_models().values()
     
     # Training the models
     models = [gauss_model, kNN_model, randforest_model, grad_boost_model]
@@ -152,9 +166,7 @@ def main():
     # https://scikit-learn.org/stable/modules/permutation_importance.html
 
     # Setting feature names
-    feature_names = ['pop_density', 'dropouts_to_grads', 'one_parent_to_two', 'crowded_to_not', 
-                'children_to_adults', 'non_minority_to_minority', 'male_to_female',
-                'divorce_rate', 'home_renters_to_owners', 'low_income_status_pct']
+    feature_names = feature_cols
 
     # Getting feature importance
     result = permutation_importance(
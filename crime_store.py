@@ -0,0 +1,243 @@
+# CMPT 353 - Final Project
+# Authors: Benley Hsiang
+#          April Nguyen
+#          Gia Hue (Hayden) Mai
+#
+# Description: Compact columnar copy of the raw crime archives (crimedata_{city}.zip), built once.
+#              Every city's records are converted to the same columns:
+#                   type            crime type (TYPE, MCI_CATEGORY, CATEGORIE), categorical
+#                   neighbourhood   neighbourhood (NEIGHBOURHOOD, NEIGHBOURHOOD_158, PDQ), categorical
+#                   year            int16
+#                   month, day      int8
+#                   hour            int8, -1 when not recorded (Montreal only has the shift)
+#                   x, y            float64 coordinates in the city's EPSG (data_processing.city_epsg),
+#                                   NaN when the location is omitted. Kept at full precision: rounding them
+#                                   (e.g. to float32, ~0.25 m) moves crimes near a border to another tract
+#              and written to datasets/crime_store/city={city}/year={year}/ as uncompressed Arrow IPC files.
+#              Reads only open the partitions matching the city/years asked for, and the files are memory-mapped
+#              so only the requested columns are paged in (no parsing, no copy), e.g.
+#                   read_crimes('van', years = [2021], columns = ['x', 'y'])
+#              The size and modification time of the archive a city was built from are saved with it
+#              (city={city}/_source.json), with the store_format it was built with. If the archive changed
+#              since, or the store was built with another format, the store of that city is not used
+#              (with a warning) until it is rebuilt.
+#
+# Usage: python3 crime_store.py [city ...]       (builds every city by default)
+#
+# crime_store.py
+# Last modified: October 19, 2026
+
+import sys
+import json
+import shutil
+import warnings
+import pathlib
+import calendar
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+from data_processing import city_epsg, read_crime_chunks
+
+store_dir = pathlib.Path('datasets') / 'crime_store'
+
+# Toronto's OCC_MONTH is the name of the month
+month_numbers = {name: number for number, name in enumerate(calendar.month_name) if name}
+
+schema = pa.schema([('type', pa.dictionary(pa.int16(), pa.string())),
+                    ('neighbourhood', pa.dictionary(pa.int16(), pa.string())),
+                    ('year', pa.int16()),
+                    ('month', pa.int8()),
+                    ('day', pa.int8()),
+                    ('hour', pa.int8()),
+                    ('x', pa.float64()),
+                    ('y', pa.float64())])
+
+# Version of schema, increase it when schema changes so older stores are rebuilt instead of read
+# (2: x, y as float64 instead of float32)
+store_format = 2
+
+# Directory layout: city={city}/year={year}/
+# (files starting with _ are not part of the dataset)
+partitioning = ds.partitioning(pa.schema([('city', pa.string()), ('year', pa.int16())]), flavor = 'hive')
+
+
+# Description: Projected x, y of a GeoDataFrame's points, NaN where the geometry is missing
+def _projected_xy(crimes, epsg, missing):
+    geometry = crimes.geometry.to_crs(epsg)
+    x = np.where(missing | geometry.isna(), np.nan, geometry.x)
+    y = np.where(missing | geometry.isna(), np.nan, geometry.y)
+    return x, y
+
+
+# Description: Finds a column that may have been truncated to 10 characters (shapefile field names)
+# Returns the first of names found in crimes, or a column of missing values
+def _column(crimes, names):
+    for name in names:
+        if name in crimes.columns:
+            return crimes[name]
+    return pd.Series(pd.NA, index = crimes.index, dtype = 'string')
+
+
+# Description: Converts a chunk of a city's raw crime records to the columns of the store
+# Precondition: crimes is a chunk of crimedata_{city}.zip as given by data_processing.read_crime_chunks
+# Returns a DataFrame with the columns of schema (rows without a year are dropped)
+def normalize_crimes(city, crimes):
+    if city == 'van':
+        # X and Y are already UTM Zone 10, both are 0 when the location is omitted
+        missing = (crimes.X <= 0) & (crimes.Y <= 0)
+        data = pd.DataFrame({'type' : crimes.TYPE,
+                             'neighbourhood' : crimes.NEIGHBOURHOOD,
+                             'year' : crimes.YEAR,
+                             'month' : crimes.MONTH,
+                             'day' : crimes.DAY,
+                             'hour' : crimes.HOUR,
+                             'x' : crimes.X.where(~missing),
+                             'y' : crimes.Y.where(~missing)})
+
+    elif city == 'tor':
+        missing = (crimes.LONG_WGS84 >= 0) & (crimes.LAT_WGS84 <= 0)
+        x, y = _projected_xy(crimes, city_epsg[city], missing.values)
+        data = pd.DataFrame({'type' : _column(crimes, ['MCI_CATEGORY', 'MCI_CATEGO']),
+                             'neighbourhood' : _column(crimes, ['NEIGHBOURHOOD_158', 'NEIGHBOURH']),
+                             'year' : crimes.OCC_YEAR,
+                             'month' : crimes.OCC_MONTH.map(month_numbers),
+                             'day' : _column(crimes, ['OCC_DAY']),
+                             'hour' : crimes.OCC_HOUR,
+                             'x' : x,
+                             'y' : y})
+
+    else:
+        # DATE is read as text or as dates depending on the GDAL driver
+        date = pd.to_datetime(crimes.DATE)
+        missing = crimes.X.isna() & crimes.Y.isna()
+        x, y = _projected_xy(crimes, city_epsg[city], missing.values)
+        data = pd.DataFrame({'type' : crimes.CATEGORIE,
+                             'neighbourhood' : crimes.PDQ.astype('Int64').astype('string'),
+                             'year' : date.dt.year,
+                             'month' : date.dt.month,
+                             'day' : date.dt.day,
+                             'hour' : -1,
+                             'x' : x,
+                             'y' : y})
+
+    data = data[data.year.notna()]
+    for col in ['month', 'day', 'hour']:
+        data[col] = data[col].fillna(-1)
+    return data
+
+
+# Description: Identifies the version of a crime archive by its path, size and modification time
+def _archive_stat(path):
+    stat = pathlib.Path(path).stat()
+    return {'archive' : str(path), 'size' : stat.st_size, 'mtime_ns' : stat.st_mtime_ns}
+
+
+# Description: Where the archive a city was built from is recorded
+def _source_file(city):
+    return store_dir / ('city=' + city) / '_source.json'
+
+
+# Description: Converts a city's crime archive into the store, replacing what was stored for it before
+#              The archive is streamed in chunks so the whole of it is never in memory
+# Returns the number of records stored
+def build_city(city, input_dir = pathlib.Path('datasets'), chunksize = 500_000):
+    city_dir = store_dir / ('city=' + city)
+    if city_dir.exists():
+        shutil.rmtree(city_dir)
+    archive = _archive_stat(input_dir / ('crimedata_' + city + '.zip'))
+
+    count = 0
+    for i, chunk in enumerate(read_crime_chunks(city, input_dir, chunksize)):
+        data = normalize_crimes(city, chunk)
+        data['city'] = city
+        table = pa.Table.from_pandas(data, schema = schema.append(pa.field('city', pa.string())),
+                                     preserve_index = False)
+        ds.write_dataset(table, store_dir, format = 'ipc', partitioning = partitioning,
+                         basename_template = 'part-' + str(i) + '-{i}.arrow',
+                         existing_data_behavior = 'overwrite_or_ignore')
+        count += len(data)
+
+    # Written last, so a city whose build was interrupted is not used
+    with open(_source_file(city), 'w') as f:
+        json.dump({**archive, 'format' : store_format}, f)
+
+    return count
+
+
+# Description: Checks if a city was imported into the store and is up to date with its archive
+#              Warns and returns False if the archive changed since the city was built, or if it was built
+#              with another store_format (an archive that was deleted after building the store doesn't make it stale)
+def has_city(city):
+    if not _source_file(city).exists():
+        return False
+
+    with open(_source_file(city)) as f:
+        source = json.load(f)
+    if source.pop('format', 1) != store_format:
+        warnings.warn(f'The crime store of {city} was built by an older version of crime_store.py, reading the '
+                      f'archive instead. Rebuild the store with: python3 crime_store.py {city}')
+        return False
+    archive = pathlib.Path(source['archive'])
+    if archive.exists() and _archive_stat(archive) != source:
+        warnings.warn(f'{archive} changed since the crime store of {city} was built, reading the archive instead. '
+                      f'Rebuild the store with: python3 crime_store.py {city}')
+        return False
+    return True
+
+
+# Description: Opens the store as a dataset of memory-mapped Arrow files
+def open_store():
+    return ds.dataset(store_dir, format = 'ipc', partitioning = partitioning,
+                      filesystem = fs.LocalFileSystem(use_mmap = True))
+
+
+# Description: Builds the filter of a read, city and years are partition keys so they prune whole directories
+def _store_filter(city, years, types, exclude_types):
+    expression = ds.field('city') == city
+    if years is not None:
+        expression &= ds.field('year').isin(list(years))
+    if types is not None:
+        expression &= ds.field('type').isin(list(types))
+    if exclude_types:
+        expression &= ~ds.field('type').isin(list(exclude_types))
+    return expression
+
+
+# Description: Reads crimes of a city from the store
+# Precondition: the city was built with build_city
+#               years, types, exclude_types are optional lists to filter with
+#               columns is an optional list of columns (default all of schema)
+# Returns a pyarrow Table
+def read_table(city, years = None, columns = None, types = None, exclude_types = None):
+    columns = list(schema.names) if columns is None else list(columns)
+    return open_store().to_table(columns = columns, filter = _store_filter(city, years, types, exclude_types))
+
+
+# Description: Same as read_table but returns a DataFrame (type and neighbourhood as pandas categoricals)
+def read_crimes(city, years = None, columns = None, types = None, exclude_types = None):
+    return read_table(city, years, columns, types, exclude_types).to_pandas()
+
+
+# Description: Same as read_crimes but yields DataFrames of at most batch_size rows, for out-of-core processing
+def iter_crimes(city, years = None, columns = None, types = None, exclude_types = None, batch_size = 100_000):
+    columns = list(schema.names) if columns is None else list(columns)
+    scanner = open_store().scanner(columns = columns, filter = _store_filter(city, years, types, exclude_types),
+                                   batch_size = batch_size)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+# Precondition: cities is an optional list of cities to build (default: the command line, or every city)
+def main(cities=None):
+    if cities is None:
+        cities = sys.argv[1:]
+    cities = cities or list(city_epsg)
+    for city in cities:
+        print(f'{city}: {build_city(city)} crimes stored')
+
+
+if __name__ == '__main__':
+    main()
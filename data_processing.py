@@ -16,9 +16,10 @@
 
 import os
 import pathlib
+import hashlib
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point
+import pyogrio
 
 # For renaming columns
 rename_cols = {'v_CA21_1: Population, 2021' : 'pop_21',
@@ -42,54 +43,243 @@ rename_cols = {'v_CA21_1: Population, 2021' : 'pop_21',
                'v_CA21_4237: Total - Private households by tenure' : 'people_in_homes',
                }
 
-# Dropping uneeded columns
+# Dropping uneeded columns, dropping is easier because the columns texts are way too long to copy paste
 drop_cols = ['CSD_UID', 'CMA_UID', 'Dwellings 2016', 'Population', 'Dwellings',
              'Population 2016', 'Households', 'Type', 'GeoUID', 'Households 2016',
              'Quality Flags', 'Shape Area', 'CD_UID', 'Region Name',
              'v_CA21_7: Land area in square kilometres']
 
-
-# Description: Converts UTM Zone 10 XY Coordinates to a Point object
-# Precondition: crime_row is a single row containing columns X & Y
-# Returns a Point object
-def utm10_to_Point(crime_row):
-    return Point(crime_row.X, crime_row.Y)
-
-
-# Description: Finds the nearest census geometry block given a Point
-# Precondition: point is a row of crime data, census is the entire GeoDataFrame
-# Returns the name of the census tract of where the crime occurred
-def closest_CT(point, census):
-    # make a list of distance between a crime and all CT blocks in the census
-    # the distance() function is part of geopandas
-    # calculates the distance between geometry in census to a single Point object in crime
-    # return 0 if it is inside of the census, otherwise gives a value
-    distances = census.geometry.distance(point.geometry)
-
-    # get the index of the closest CT block to the point
-    closest_index = distances.argmin()
-
-    # take the row of the census & return
-    census_CT = census.loc[closest_index]
-
-    return census_CT['name']
+# CHANGE WHEN ADDING FEATURES
+# Features calculated by feature_engineer, used by every analysis and model in this order
+# {feature: (numerator, denominator)} of the renamed census columns, None for a column used as it is
+# (a new census column also needs its name in rename_cols, and must not be in drop_cols)
+features = {'pop_density' : ('pop_21', 'area_sqkm'),                                        # population density
+            'dropouts_to_grads' : ('hs_dropout', 'total_highschool_count'),                 # high school dropouts to graduates
+            'one_parent_to_two' : ('one_parent_families', 'total_families'),                # single-parent to two-parent families
+            'crowded_to_not' : ('households_more_than_one_per_room', 'total_households'),   # crowded to non-crowded households
+            'children_to_adults' : ('age_0_to_14', 'pop_21'),                               # children to adults
+            'non_minority_to_minority' : ('non_minority_count', 'minority_count'),          # non-minorities to minorities
+            'male_to_female' : ('age_count_males', 'pop_21'),                               # males to females
+            'divorce_rate' : ('divorced', 'marital_count'),                                 # divorce rate
+            'home_renters_to_owners' : ('home_renters', 'people_in_homes'),                 # home renters to home owners
+            'low_income_status_pct' : None,                                                 # prevalence of low income (%)
+            }
+feature_cols = list(features)
+
+# Features left out of the log(crime_rate) OLS model of stats_analysis.py and spatial_stats.py
+ols_excluded = ['children_to_adults', 'divorce_rate']
+ols_cols = [col for col in feature_cols if col not in ols_excluded]
+
+# Projected CRS used for distance calculations in each city
+# toronto is epsg:2958, montreal is epsg:2950, vancouver is UTM Zone 10 (epsg:32610)
+city_epsg = {'van' : 'epsg:32610',
+             'tor' : 'epsg:2958',
+             'mon' : 'epsg:2950',
+             }
+
+
+# Census data as downloaded, and where projected copies of it are kept between runs
+census_zip = 'censusdata.zip'
+census_cache_dir = 'census_cache'
+
+
+# Description: Finds where a city's census tracts are stored
+#              A censusdata_{city}.geojson written by get_census.R takes priority,
+#              otherwise the member of the same name inside censusdata.zip is used (no need to unzip)
+# Precondition: city is a key of city_epsg, input_dir contains censusdata.zip or the GeoJSON files
+# Returns (path GDAL can read, path of the file on disk)
+def census_source(city, input_dir):
+    filename = 'censusdata_' + city + '.geojson'
+    if (input_dir / filename).exists():
+        return str(input_dir / filename), input_dir / filename
+    return '/vsizip/' + str(input_dir / census_zip) + '/' + filename, input_dir / census_zip
+
+
+# Description: Loads a city's census tracts with the unneeded columns dropped, the rest renamed,
+#              and the geometry projected to the city's EPSG
+#              The first load parses the GeoJSON (only the kept columns) and saves the result as GeoParquet,
+#              later loads read the binary cache directly. The cache is rebuilt whenever the source file,
+#              the EPSG, drop_cols or rename_cols change.
+# Precondition: city is a key of city_epsg
+# Returns a GeoDataFrame in city_epsg[city]
+def load_census(city, input_dir = pathlib.Path('datasets')):
+    epsg = city_epsg[city]
+    source, source_file = census_source(city, input_dir)
+
+    # Cache key: anything that changes what the cached file would contain
+    stat = source_file.stat()
+    key = repr((source, stat.st_size, stat.st_mtime_ns, epsg, drop_cols, sorted(rename_cols.items())))
+    key = hashlib.sha1(key.encode()).hexdigest()[:12]
+
+    cache_dir = input_dir / census_cache_dir
+    cache_file = cache_dir / ('census_' + city + '_' + key + '.parquet')
+    if cache_file.exists():
+        return gpd.read_parquet(cache_file)
+
+    # Parse only the columns we keep instead of dropping them afterwards
+    fields = pyogrio.read_info(source)['fields']
+    census = gpd.read_file(source, columns = [col for col in fields if col not in drop_cols])
+    census = census.rename(columns = rename_cols)
+    census = census.to_crs(epsg)
+
+    # Replace any stale cache of this city
+    os.makedirs(cache_dir, exist_ok = True)
+    for old in cache_dir.glob('census_' + city + '_*.parquet'):
+        old.unlink()
+    census.to_parquet(cache_file)
+
+    return census
+
+
+# Description: Streams the raw crime records of a city without loading the whole archive
+# Precondition: crimedata_{city}.zip is in input_dir
+# Yields DataFrames (van) or GeoDataFrames (tor, mon) of at most chunksize rows
+def read_crime_chunks(city, input_dir, chunksize):
+    path = input_dir / ('crimedata_' + city + '.zip')
+
+    if city == 'van':
+        yield from pd.read_csv(path, compression = 'zip', chunksize = chunksize)
+        return
+
+    # One pass over the file in Arrow batches (reading with rows = slice(...) per chunk would
+    # parse every skipped record again each time)
+    start = 0
+    with pyogrio.open_arrow(path, batch_size = chunksize, use_pyarrow = True) as (meta, reader):
+        geometry = meta['geometry_name'] or 'wkb_geometry'
+        for batch in reader:
+            chunk = batch.to_pandas()
+            chunk.index += start
+            start += len(chunk)
+            yield gpd.GeoDataFrame(chunk.drop(columns = [geometry]),
+                                   geometry = gpd.GeoSeries.from_wkb(chunk[geometry], crs = meta['crs']))
+
+
+# Crimes that aren't recorded in every city's data
+# Toronto: keep everything (?), does not contain homicides & vehicle collisions
+# Vancouver: remove vehicle collisions & homicide
+# Montreal: remove Infractions entrainant la mort (homicide, etc.), no vehicle collisions
+excluded_types = {'van' : ["Homicide",
+                           "Vehicle Collision or Pedestrian Struck (with Fatality)",
+                           "Vehicle Collision or Pedestrian Struck (with Injury)"],
+                  'tor' : [],
+                  'mon' : ["Infractions entrainant la mort"],
+                  }
+
+
+# Crime columns kept with the points, for the counts by time and type of crime_cube.py
+crime_time_cols = ['type', 'year', 'month', 'hour']
+
+
+# Description: Filters a city's raw crime records and converts them to points in the city's EPSG
+#              Works the same on the whole file or on a chunk of it (see partitioned_etl.py)
+#              The columns of every city are converted to the same ones as the crime store first
+#              (crime_store.normalize_crimes), so both are cleaned the same way
+# Precondition: crimes is the raw data of crimedata_{city}.zip (DataFrame for van, GeoDataFrame otherwise)
+#               year is the year of crimes to keep, None for every year
+# Returns a GeoDataFrame with columns X, Y, type, year, month, hour & geometry in city_epsg[city]
+def clean_crimes(city, crimes, year = 2021):
+    # imported here because crime_store imports this module
+    import crime_store
+
+    # Vancouver's X and Y are already UTM Zone 10 (epsg:32610), the others are projected to city_epsg
+    # Locations that are omitted become NaN and are dropped by stored_crimes_to_points
+    crimes = crime_store.normalize_crimes(city, crimes)
+
+    # Keep the year and drop the crimes not in every dataset
+    if year is not None:
+        crimes = crimes[crimes.year == year]
+    crimes = crimes[~crimes.type.isin(excluded_types[city])]
+
+    return stored_crimes_to_points(city, crimes)
+
+
+# Description: Converts crimes read from crime_store.py to the same format as clean_crimes
+# Precondition: crimes has the x, y columns of the store (already in city_epsg[city]), and optionally
+#               the columns of crime_time_cols
+# Returns a GeoDataFrame with columns X, Y, the columns of crime_time_cols it had, & geometry in city_epsg[city]
+def stored_crimes_to_points(city, crimes):
+    crimes = crimes[crimes.x.notna()]
+    crimes_loc = pd.DataFrame({'X' : crimes.x.astype(float), 'Y' : crimes.y.astype(float)})
+    for col in crime_time_cols:
+        if col in crimes.columns:
+            crimes_loc[col] = crimes[col]
+    return gpd.GeoDataFrame(crimes_loc, geometry = gpd.points_from_xy(crimes_loc.X, crimes_loc.Y),
+                            crs = city_epsg[city])
+
+
+# Description: Loads the crimes of a city, cleaned like clean_crimes
+#              Reads only the columns needed (and only that year if given) from the crime store if it was built
+#              (crime_store.py), otherwise the whole crimedata_{city}.zip
+# Precondition: year is the year of crimes to load, None for every year
+# Returns a GeoDataFrame with columns X, Y, type, year, month, hour & geometry in city_epsg[city]
+def load_crimes(city, input_dir = pathlib.Path('datasets'), year = 2021):
+    # imported here because crime_store imports this module
+    import crime_store
+
+    if crime_store.has_city(city):
+        crimes = crime_store.read_crimes(city, years = None if year is None else [year],
+                                         columns = crime_time_cols + ['x', 'y'],
+                                         exclude_types = excluded_types[city])
+        return stored_crimes_to_points(city, crimes)
+
+    if city == 'van':
+        crimes = pd.read_csv(input_dir / ('crimedata_' + city + '.zip'), compression = 'zip')
+    else:
+        crimes = gpd.read_file(input_dir / ('crimedata_' + city + '.zip'))
+    return clean_crimes(city, crimes, year)
+
+
+# Description: Same as load_crimes, but yields the crimes in chunks of at most chunksize rows
+def iter_crimes(city, input_dir = pathlib.Path('datasets'), year = 2021, chunksize = 100_000):
+    # imported here because crime_store imports this module
+    import crime_store
+
+    if crime_store.has_city(city):
+        for crimes in crime_store.iter_crimes(city, years = None if year is None else [year],
+                                              columns = crime_time_cols + ['x', 'y'],
+                                              exclude_types = excluded_types[city], batch_size = chunksize):
+            yield stored_crimes_to_points(city, crimes)
+    else:
+        for chunk in read_crime_chunks(city, input_dir, chunksize):
+            yield clean_crimes(city, chunk, year)
+
+
+# Description: Finds the nearest census tract of every crime (distance is 0 if the crime is inside of it)
+#              Uses a spatial index over the tracts instead of measuring the distance to every tract
+# Precondition: crimes, census are GeoDataFrames in the same projected CRS
+#               max_distance limits the search, crimes with no tract that close get NaN
+# Returns a Series with the name of the census tract of each crime, indexed like crimes
+def assign_tracts(crimes, census, max_distance = None):
+    crime_index, census_index = census.sindex.nearest(crimes.geometry, max_distance = max_distance,
+                                                      return_all = True)
+
+    # A crime can be exactly as close to two tracts (e.g. on a shared border),
+    # take the first tract by name so the result doesn't depend on which tracts were searched
+    nearest = pd.DataFrame({'crime' : crime_index, 'name' : census['name'].values[census_index]}) \
+                .sort_values(['crime', 'name']) \
+                .drop_duplicates('crime')
+
+    names = pd.Series(index = crimes.index, dtype = object, name = 'name')
+    names.iloc[nearest.crime.values] = nearest.name.values
+    return names
 
 
 # Description: Calculate the crime count for each census tract
 # Precondition: crimes, census are data sets, epsg is a string containing EPSG information to such data
+#               crime_CT is an optional Series of the tract of each crime (assign_tracts), found here if not given
 # Returns a GeoDataFrame containing the census data with crime counts
-def census_crime_count(crimes, census, epsg):
+def census_crime_count(crimes, census, epsg, crime_CT = None):
     # Convert census's geometry from epsg:4326 to the appropriate EPSG for distance function
-    census.geometry = census.geometry.to_crs(epsg)
+    # (load_census already returns it projected)
+    if census.crs != epsg:
+        census.geometry = census.geometry.to_crs(epsg)
 
     # Entity Resolution - where the crime happened on census tract
     # Find the closest CT and join that row with the crime (hopefully its accurate enough after EPSG conversion)
-    # crime_CT will contain the best census tract, tracked by the index value
+    # crime_CT will contain the best census tract name
     # This is the same procedure as Exercise 4
-    crime_CT = crimes.apply(closest_CT, census = census, axis = 1)
-
-    # Name the Series to join
-    crime_CT.name = "name"
+    if crime_CT is None:
+        crime_CT = assign_tracts(crimes, census)
 
     # Merging the two tables together by index
     crimes_census_CT = crimes.join(crime_CT, how = "right")
@@ -123,148 +313,93 @@ def feature_engineer(city_data):
     city_data = city_data[city_data['pop_21'] != 0]
     city_data = city_data[city_data['total_families'] != 0]
     
-    # Calculating population density
-    city_data['pop_density'] = city_data['pop_21'] / city_data['area_sqkm']
-    
-    # Calculating proportion of high school dropouts to graduates
-    city_data['dropouts_to_grads'] = city_data['hs_dropout'] / city_data['total_highschool_count']
-    
-    # Calculating proportion of single-parent to two-parent families
-    city_data['one_parent_to_two'] = city_data['one_parent_families'] / city_data['total_families']
-    
-    # Calculating proportion of crowded to non-crowded households
-    city_data['crowded_to_not'] = city_data['households_more_than_one_per_room'] / city_data['total_households']
-    
-    # Calculating proportion of children to adults
-    city_data['children_to_adults'] = city_data['age_0_to_14'] / city_data['pop_21']
-    
-    # Calculating proportion of non-minorities to minorities
-    city_data['non_minority_to_minority'] = city_data['non_minority_count'] / city_data['minority_count']
-    
-    # Calculating proportion of males to females
-    city_data['male_to_female'] = city_data['age_count_males'] / city_data['pop_21']
-    
-    # Calculating divorce rate
-    city_data['divorce_rate'] = city_data['divorced'] / city_data['marital_count']
-    
-    # Calculating proportion of home renters to home owners
-    city_data['home_renters_to_owners'] = city_data['home_renters'] / city_data['people_in_homes']
+    # Calculating every ratio of the features registry
+    for feature, ratio in features.items():
+        if ratio is not None:
+            numerator, denominator = ratio
+            city_data[feature] = city_data[numerator] / city_data[denominator]
     
     # Calculating crime rate
     city_data['crime_rate'] = city_data['crime_count'] / city_data['pop_21']
     
     # Keeping only the necessary columns
-    city_data = city_data[['name', 'pop_density', 'dropouts_to_grads', 'one_parent_to_two', 
-                           'crowded_to_not', 'children_to_adults', 'non_minority_to_minority',
-                           'male_to_female', 'divorce_rate', 'home_renters_to_owners',
-                           'low_income_status_pct', 'crime_rate', 'geometry']]
+    city_data = city_data[['name'] + feature_cols + ['crime_rate', 'geometry']]
     
     # Returning the filtered dataframe
     return city_data
 
 
-def main():
+# Description: Calculates the features of a city and saves them as GeoJSON in epsg:4326
+# Precondition: crime_census is the output of census_crime_count, filename is the GeoJSON to write
+# Returns the saved GeoDataFrame, indexed the same way as when the file is read back
+def save_crime_census(crime_census, filename):
+    # Calculate features
+    crime_census = feature_engineer(crime_census)
+
+    # Convert to geo dataframe
+    crimes_final = gpd.GeoDataFrame(crime_census)
+
+    # Convert geometry back to epsg:4326 & save file to crime_census as GeoJSON
+    crimes_final.geometry = crimes_final.geometry.to_crs("epsg:4326")
+    crimes_final.to_file(filename = filename, driver='GeoJSON')
+
+    return crimes_final.reset_index(drop = True)
+
+
+# Precondition: crimes_van is an optional DataFrame of crimedata_van.zip that was already loaded
+#               (e.g. by run_analysis.py), otherwise it is read from datasets
+# Returns a dict of {city: GeoDataFrame} with the same data as the saved crime_census_{city}.geojson
+def main(crimes_van=None):
     input_dir = pathlib.Path('datasets')
     output_dir = pathlib.Path('crime_census')
 
     # Read the data
-    crimes_van = pd.read_csv(input_dir / "crimedata_van.zip", compression = 'zip')
-    crimes_tor = gpd.read_file(input_dir / "crimedata_tor.zip")
-    crimes_mon = gpd.read_file(input_dir / "crimedata_mon.zip")
-    van_census = gpd.read_file(input_dir / "censusdata_van.geojson")
-    tor_census = gpd.read_file(input_dir / "censusdata_tor.geojson")
-    mon_census = gpd.read_file(input_dir / "censusdata_mon.geojson")
-
-    # Filter all crimes data to only contain 2021
-    crimes_van = crimes_van[(crimes_van.YEAR == 2021)]
-    crimes_tor = crimes_tor[(crimes_tor.OCC_YEAR == 2021)]
-    crimes_mon = crimes_mon[(crimes_mon.DATE.dt.year == 2021)]
-
-    # Filter out data where longitude and latitude are omitted
-    crimes_van = crimes_van[(crimes_van.X > 0) | (crimes_van.Y > 0)]
-    crimes_tor = crimes_tor[(crimes_tor.LONG_WGS84 < 0) | (crimes_tor.LAT_WGS84 > 0)]
-    crimes_mon = crimes_mon[(crimes_mon.X.notnull()) | (crimes_mon.Y.notnull())]
-
-    # Filter out best we could to have only crimes that occurs across datasets
-    # Toronto: keep everything (?), does not contain homicides & vehicle collisions
-    # Vancouver: remove vehicle collisions & homicide
-    # Montreal: remove Infractions entrainant la mort (homicide, etc.), no vehicle collisions
-    crimes_van = crimes_van[(crimes_van.TYPE != "Homicide") & 
-                            (crimes_van.TYPE != "Vehicle Collision or Pedestrian Struck (with Fatality)") & 
-                            (crimes_van.TYPE != "Vehicle Collision or Pedestrian Struck (with Injury)")]
-
-    crimes_mon = crimes_mon[crimes_mon.CATEGORIE != "Infractions entrainant la mort"]
-
-    # Drop all other columns that is not location or geometry since we don't care about them
-    crimes_van_loc = crimes_van[['X', 'Y']]
-    crimes_tor_loc = crimes_tor[['LONG_WGS84', 'LAT_WGS84', 'geometry']] \
-                    .rename(columns = {'LONG_WGS84':'X'}) # just to work in transform_data()
-    crimes_mon_loc = crimes_mon[['X', 'Y', 'geometry']]
-
-    
-    # CHANGE WHEN ADDING FEATURES
-    # Same goes for census data, dropping is faster because the columns texts are way too long to copy paste
-    van_census = van_census.drop(columns = drop_cols)
-    tor_census = tor_census.drop(columns = drop_cols)
-    mon_census = mon_census.drop(columns = drop_cols)
-
-    # Shorten column names
-    van_census = van_census.rename(columns = rename_cols)
-    tor_census = tor_census.rename(columns = rename_cols)
-    mon_census = mon_census.rename(columns = rename_cols)
-    
-    # Prep the data for census_crime_count()
-    # Use utm_to_Point to get each row a Points object
-    # Toronto and Montreal already have them
-    crimes_van_Points = crimes_van_loc.apply(utm10_to_Point, axis = 1)
-
-    # Converting XY data in crime to the format other geometry data are using
-    # Data is using UTM Zone 10 and epsg:32610 is the appropriate format
-    # Use .to_crs("epsg:4326") for mapping, epsg:32610 is for getting distance
-    # https://gis.stackexchange.com/questions/431058/getting-wrong-coordinates-converting-utm-to-lon-lat-with-proj
-    crimes_van_Points = gpd.GeoSeries(crimes_van_Points, crs = 32610)
-    crimes_van_Points.name = 'geometry'
-    crimes_van_loc = gpd.GeoDataFrame(crimes_van_loc)
-    crimes_van_loc = crimes_van_loc.join(crimes_van_Points)
-
-    # Convert other geometry GeoDataFrame to the same format for calculating distance
-    # toronto is epsg:2958
-    # montreal is epsg:2950
-    # https://pyproj4.github.io/pyproj/stable/examples.html
-    # Map: https://crs-explorer.proj.org/?ignoreWorld=false&allowDeprecated=false&authorities=EPSG&activeTypes=PROJECTED_CRS&map=osm
-    crimes_tor_loc.loc[:, "geometry"] = crimes_tor_loc.geometry.to_crs(crs = 'epsg:2958')
-    crimes_mon_loc.loc[:, "geometry"] = crimes_mon_loc.geometry.to_crs(crs = 'epsg:2950')
-
-    # setting crs format to its proper EPSG, for some reason it doesn't get converted properly
-    # https://stackoverflow.com/questions/66365200/to-crsepsg4326-retruns-different-coordinate
-    temp = crimes_tor_loc.set_crs('epsg:2958', allow_override= True, inplace = True)
-    crimes_mon_loc = crimes_mon_loc.copy().set_crs('epsg:2950', allow_override= True, inplace = True)
-
+    # Census tracts, with drop_cols/rename_cols applied and already projected for the distance function
+    van_census = load_census('van', input_dir)
+    tor_census = load_census('tor', input_dir)
+    mon_census = load_census('mon', input_dir)
+
+    # Read the crimes of every year (from crime_store if it was built), drop the ones without a location or
+    # not found in every dataset, and convert them to points in the same format as the census
+    # Every year is kept for the crime cubes, the analysis uses 2021
+    if crimes_van is not None:
+        crimes_van_loc = clean_crimes('van', crimes_van, year = None)
+    else:
+        crimes_van_loc = load_crimes('van', input_dir, year = None)
+    crimes_tor_loc = load_crimes('tor', input_dir, year = None)
+    crimes_mon_loc = load_crimes('mon', input_dir, year = None)
 
     # Merging Data - automated step because it's all now in the same format kinda
     # list for loop to use
     crimes_cities = [crimes_van_loc, crimes_tor_loc, crimes_mon_loc]
     census_cities = [van_census, tor_census, mon_census]
-    epsg = ["epsg:32610", "epsg:2958", "epsg:2950"]
+    epsg = [city_epsg['van'], city_epsg['tor'], city_epsg['mon']]
     cities_str = ['_van', '_tor', '_mon']
+    crime_census = {}
 
     # Make a folder
     os.makedirs(output_dir, exist_ok=True)
 
+    # imported here because crime_cube imports this module
+    import crime_cube
+
     # Loop for merging crime and census for 3 cities
     for i in range(3):
-        # Function will merge data
-        crime_census_save = census_crime_count(crimes_cities[i], census_cities[i], epsg[i])
-
-        # Calculate features
-        crime_census_save2 = feature_engineer(crime_census_save)
-        
-        # Convert to geo dataframe
-        crimes_final = gpd.GeoDataFrame(crime_census_save2)
-
-        # Convert geometry back to epsg:4326 & save file to crime_census as GeoJSON
-        crimes_final.geometry = crimes_final.geometry.to_crs("epsg:4326")
-        crimes_final.to_file(filename = output_dir / ('crime_census'+cities_str[i]+'.geojson'), driver='GeoJSON')
+        # Nearest census tract of the crimes of every year, found once for both the 2021 counts and the cube
+        crime_CT = assign_tracts(crimes_cities[i], census_cities[i])
+
+        # Function will merge data (crimes of 2021)
+        in_2021 = (crimes_cities[i].year == 2021).values
+        crime_census_save = census_crime_count(crimes_cities[i][in_2021], census_cities[i], epsg[i], crime_CT[in_2021])
+
+        # Calculate features, save, and keep the result in memory
+        crime_census[cities_str[i][1:]] = save_crime_census(crime_census_save, output_dir / ('crime_census'+cities_str[i]+'.geojson'))
+
+        # Crime counts of every year by tract, month, hour and type for crime_cube.py, from the crimes already loaded
+        crime_cube.save_cube(crime_cube.build_cube(cities_str[i][1:], census_cities[i], crimes_cities[i], crime_CT),
+                             output_dir)
+
+    return crime_census
 
 
 if __name__=='__main__':
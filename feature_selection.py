@@ -0,0 +1,188 @@
+# CMPT 353 - Final Project
+# Authors: Benley Hsiang
+#          April Nguyen
+#          Gia Hue (Hayden) Mai
+#
+# Description: Feature-set experiments on the features registry of data_processing.py, for the kNN and
+#              tree models of crime_model.py:
+#               - drop_one: cross-validated R^2 of every feature set missing one feature, compared to all features
+#               - forward:  forward selection, starting with no features and adding the one that improves the
+#                           score the most until none does (each model gets its own feature set)
+#              Every feature set is scored on the same cross-validation splits as model_evaluation.py.
+#              The work shared by every feature set is done once:
+#               - the features of the 3 cities are stacked once for every feature
+#               - each split is scaled once with every feature. StandardScaler scales every column on its own,
+#                 so the columns of a feature set are taken from the scaled matrix instead of scaling again
+#               - a (model, feature set) that was already scored is not fitted again, e.g. drop_one's
+#                 feature sets are reused by the last steps of forward selection
+#              All (feature set x split x model) fits of an experiment (or of a forward selection step) run in
+#              one parallel batch with joblib, so the drop-one ablation over 10 features costs one round of
+#              fits across cores instead of 10 separate runs.
+#              Uses the crime_census_{city}.geojson data created by data_processing.py
+#
+# Usage: python3 feature_selection.py [--experiments drop_one forward] [--models kNN rand_f grad_b]
+#                                     [--folds 5] [--repeats 1] [--scheme kfold] [--jobs -1] [--seed 353]
+#
+# feature_selection.py
+# Last modified: October 19, 2026
+
+import os
+import argparse
+import pathlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from joblib import Parallel, delayed
+from data_processing import feature_cols
+from model_evaluation import cities, model_names, stack_cities, make_splits, scale_split, fit_score
+
+# Models the experiments are run on by default, the Gaussian process is left out (too slow to fit this often)
+default_models = ['kNN', 'rand_f', 'grad_b']
+
+
+# Description: Cross-validation data shared by every feature set
+# Precondition: crime_census is a dict of {city: GeoDataFrame}
+# Returns a dict with y, city, the splits and the scaled (train, valid) matrices of every split, all features
+def prepare(crime_census, scheme = 'kfold', folds = 5, repeats = 1, seed = 353):
+    X, y, city = stack_cities(crime_census, feature_cols)
+    splits = make_splits(scheme, city, folds, repeats, seed)
+    return {'y' : y, 'city' : city, 'splits' : splits, 'scaled' : [scale_split(X, split) for split in splits]}
+
+
+# Description: Fits one model on the columns of a feature set for one split (run in a worker)
+# Returns the R^2 score of the whole validation fold
+def fit_subset(name, split, columns, X_train, y_train, X_valid, y_valid, city_valid):
+    # First row of fit_score is the score of the whole validation fold
+    return fit_score(name, split, X_train[:, columns], y_train, X_valid[:, columns], y_valid, city_valid)[0]['r2']
+
+
+# Description: Scores (model, feature set) candidates that were not scored before, all in one parallel batch
+# Precondition: candidates is a list of (model name, tuple of features), cache is a dict of
+#               {(model name, frozenset of features): score} that new scores are added to
+# Returns a list of mean R^2 scores in the order of candidates
+def score_sets(candidates, data, cache, n_jobs = -1):
+    new = list(dict.fromkeys((name, frozenset(subset)) for name, subset in candidates
+                             if (name, frozenset(subset)) not in cache))
+
+    tasks = []
+    for name, subset in new:
+        # Keep the registry's order of columns
+        columns = [i for i, col in enumerate(feature_cols) if col in subset]
+        for split, (X_train, X_valid) in zip(data['splits'], data['scaled']):
+            tasks.append(delayed(fit_subset)(name, split, columns, X_train, data['y'][split['train']],
+                                             X_valid, data['y'][split['valid']], data['city'][split['valid']]))
+
+    scores = Parallel(n_jobs = n_jobs)(tasks)
+    per_set = len(data['splits'])
+    for i, key in enumerate(new):
+        cache[key] = np.mean(scores[i * per_set:(i + 1) * per_set])
+
+    return [cache[(name, frozenset(subset))] for name, subset in candidates]
+
+
+# Description: Drop-one ablation, scores all features and every set missing one feature
+# Returns a DataFrame with the model, dropped feature ('' for all features), score and change from all features
+def drop_one(data, models, cache, n_jobs = -1):
+    candidates = [(name, tuple(feature_cols)) for name in models]
+    candidates += [(name, tuple(col for col in feature_cols if col != dropped))
+                   for name in models for dropped in feature_cols]
+    scores = score_sets(candidates, data, cache, n_jobs)
+
+    results = pd.DataFrame({'model' : [name for name, _ in candidates],
+                            'dropped' : [''] * len(models) + [dropped for name in models for dropped in feature_cols],
+                            'r2' : scores})
+    full = results[results.dropped == ''].set_index('model').r2
+    results['change'] = results.r2 - results.model.map(full)
+    return results
+
+
+# Description: Forward selection for every model, one parallel batch per step for all models still improving
+# Precondition: max_features is an optional limit on the number of features selected
+# Returns a DataFrame with one row per (model, step): the feature added, the features so far and the score
+def forward(data, models, cache, n_jobs = -1, max_features = None):
+    max_features = max_features or len(feature_cols)
+    selected = {name: [] for name in models}
+    best = {name: -np.inf for name in models}
+    active = list(models)
+    steps = []
+
+    for step in range(1, max_features + 1):
+        candidates = [(name, tuple(selected[name] + [col])) for name in active
+                      for col in feature_cols if col not in selected[name]]
+        if not candidates:
+            break
+        scores = score_sets(candidates, data, cache, n_jobs)
+
+        still_active = []
+        for name in active:
+            options = [(score, subset[-1]) for (model, subset), score in zip(candidates, scores) if model == name]
+            score, col = max(options)
+            # Stops once adding a feature doesn't improve the score
+            if score <= best[name]:
+                continue
+            best[name] = score
+            selected[name].append(col)
+            steps.append({'model' : name, 'step' : step, 'added' : col,
+                          'features' : ' '.join(selected[name]), 'r2' : score})
+            still_active.append(name)
+        active = still_active
+
+    return pd.DataFrame(steps, columns = ['model', 'step', 'added', 'features', 'r2'])
+
+
+# Description: Prints the results of the experiments
+def print_results(results):
+    if 'drop_one' in results:
+        print('\nDrop-one ablation (mean R^2, change from all features):')
+        for name, group in results['drop_one'].groupby('model', sort = False):
+            print('\n' + model_names[name] + ':\n')
+            for row in group.itertuples():
+                print(f'{"all features" if row.dropped == "" else "without " + row.dropped:<35}'
+                      f'{row.r2:.3f}  ({row.change:+.3f})')
+
+    if 'forward' in results:
+        print('\nForward selection (mean R^2 after adding each feature):')
+        for name, group in results['forward'].groupby('model', sort = False):
+            print('\n' + model_names[name] + ':\n')
+            for row in group.itertuples():
+                print(f'{row.step:>2}. + {row.added:<30}{row.r2:.3f}')
+
+
+# Precondition: crime_census is an optional dict of {city: GeoDataFrame} that was already loaded
+#               (e.g. by run_analysis.py), otherwise the crime_census_{city}.geojson files are read
+def main(crime_census=None, args=None):
+    parser = argparse.ArgumentParser(description = 'Drop-one and forward selection feature-set experiments.')
+    parser.add_argument('--experiments', nargs = '+', choices = ['drop_one', 'forward'],
+                        default = ['drop_one', 'forward'])
+    parser.add_argument('--models', nargs = '+', choices = list(model_names), default = default_models)
+    parser.add_argument('--folds', type = int, default = 5)
+    parser.add_argument('--repeats', type = int, default = 1)
+    parser.add_argument('--scheme', choices = ['kfold', 'loco'], default = 'kfold')
+    parser.add_argument('--max-features', type = int, default = None, help = 'stop forward selection at this many')
+    parser.add_argument('--jobs', type = int, default = -1, help = 'processes to use (default: all cores)')
+    parser.add_argument('--seed', type = int, default = 353)
+    args = parser.parse_args(args)
+
+    if crime_census is None:
+        input_dir = pathlib.Path('crime_census')
+        crime_census = {city: gpd.read_file(input_dir / ('crime_census_' + city + '.geojson')) for city in cities}
+
+    data = prepare(crime_census, args.scheme, args.folds, args.repeats, args.seed)
+    # Scores of every (model, feature set) fitted so far, shared by the experiments
+    cache = {}
+
+    results = {}
+    if 'drop_one' in args.experiments:
+        results['drop_one'] = drop_one(data, args.models, cache, args.jobs)
+    if 'forward' in args.experiments:
+        results['forward'] = forward(data, args.models, cache, args.jobs, args.max_features)
+    print_results(results)
+
+    output_dir = pathlib.Path('feature_selection')
+    os.makedirs(output_dir, exist_ok = True)
+    for name, result in results.items():
+        result.to_csv(output_dir / (name + '.csv'), index = False)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,16 +9,9 @@
 #                   - one data point corresponds to one geographic area
 #                   - i.e. One data point is (x,y) = (feature count of geographic area, crime count of geographic area) 
 #              Uses the crime_census_{city}.geojson data created by data_processing.py
-#              Demographic features include: 
+#              Demographic features are those of the features registry in data_processing.py, e.g.
 #               - 'pop_density'
 #               - 'dropouts_to_grads'
-#               - 'one_parent_to_two'
-#               - 'crowded_to_not', 
-#               - 'children_to_adults'
-#               - 'non_minority_to_minority'
-#               - 'male_to_female',
-#               - 'divorce_rate'
-#               - 'home_renters_to_owners'
 #               - 'low_income_status_pct'
 #
 # initial_plots.py
@@ -33,20 +26,24 @@ from scipy.stats import linregress
 import os
 import seaborn as sns
 import pathlib
+from data_processing import feature_cols
 
-def main():
+# Precondition: crime_census is an optional dict of {city: GeoDataFrame} that was already loaded
+#               (e.g. by run_analysis.py), otherwise the crime_census_{city}.geojson files are read
+def main(crime_census=None):
     cities = ['van']
     y = 'crime_rate'
-    demographics = ['pop_density', 'dropouts_to_grads', 'one_parent_to_two', 'crowded_to_not', 
-                'children_to_adults', 'non_minority_to_minority', 'male_to_female',
-                'divorce_rate', 'home_renters_to_owners', 'low_income_status_pct']
+    demographics = feature_cols
     os.makedirs('initial_plots', exist_ok=True)
     for city in cities:
         city_folder = os.path.join('initial_plots', city)
         os.makedirs(city_folder, exist_ok=True)
-        filename = 'crime_census_' + city + '.geojson'
-        input_dir = pathlib.Path('crime_census')
-        data = gpd.read_file(input_dir / filename)
+        if crime_census is not None:
+            data = crime_census[city]
+        else:
+            filename = 'crime_census_' + city + '.geojson'
+            input_dir = pathlib.Path('crime_census')
+            data = gpd.read_file(input_dir / filename)
 
         # Create a box plot. Shows the median, quartiles, range, outliers of crime counts for each city
         plt.figure(figsize=(10,5))
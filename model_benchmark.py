@@ -0,0 +1,311 @@
+# CMPT 353 - Final Project
+# Authors: Benley Hsiang
+#          April Nguyen
+#          Gia Hue (Hayden) Mai
+#
+# Description: Benchmarks how the four models of crime_model.py and its permutation importance step scale with
+#              the number of rows, to see which models would still work with smaller geographic areas than
+#              census tracts (we have ~1,500 tracts today).
+#              Synthetic tables with the same ten feature columns and a crime_rate are generated at every size
+#              (1k to 1M rows by default). By default they are resampled from the crime_census_{city}.geojson
+#              files with a little noise added, so the features have realistic distributions. Without those
+#              files, skewed random features are generated instead.
+#              For every model, size and n_jobs configuration it measures:
+#                   fit_s                time to fit the pipeline (scaler + regressor)
+#                   predict_rows_per_s   batch prediction throughput on a held-out table
+#                   latency_ms_p50/p95   time to predict a single row
+#                   peak_rss_mb          peak memory of the process during the fit and predictions
+#              and for the random forest, the time of permutation_importance as run by crime_model.py
+#              (perm_importance_s), and how much it raises the peak memory above that of the fit and
+#              predictions (perm_added_rss_mb, 0 if it stays under it). It runs after the rest so peak_rss_mb
+#              is comparable between models, and on joblib threads so its memory is all in this process.
+#              Every measurement runs in a fresh process, one at a time, so peak memory is that of the
+#              measurement alone and measurements don't compete for cores.
+#              A model is skipped at a size if its last fit, scaled up to that size, would take longer than
+#              --budget seconds, or when its memory would obviously not fit (the Gaussian process keeps an
+#              n x n kernel matrix). Fit times are scaled up with the growth seen between the last two sizes,
+#              and at least linearly (n^3 for the Gaussian process, see fit_growth).
+#              Results are written to model_benchmark/{name}.csv with the run's environment in {name}.json,
+#              and two runs can be compared with --compare.
+#
+# Usage: python3 model_benchmark.py [--rows 1000 10000 100000 1000000] [--models gauss kNN rand_f grad_b]
+#                                   [--jobs 1 2] [--budget 600] [--name NAME] [--synthetic]
+#        python3 model_benchmark.py --compare model_benchmark/before.csv model_benchmark/after.csv
+#
+# model_benchmark.py
+# Last modified: October 19, 2026
+
+import os
+import sys
+import json
+import time
+import argparse
+import pathlib
+import platform
+import resource
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import parallel_backend
+from sklearn.inspection import permutation_importance
+from crime_model import make_models
+from data_processing import feature_cols
+
+cities = ['van', 'tor', 'mon']
+output_dir = pathlib.Path('model_benchmark')
+
+# Largest table each model is fitted on: the Gaussian process keeps several n x n matrices
+# (about 2 GB at 5,000 rows, so 8 GB at 10,000)
+max_rows = {'gauss' : 10_000}
+
+# Least power of the rows that a model's fit time is expected to grow with, used to decide whether
+# the next size fits in the budget: the Gaussian process solves an n x n system (n^3), the others are
+# taken as linear unless the last two sizes grew faster
+fit_growth = {'gauss' : 3}
+
+# Rows predicted at once for the throughput, and single-row predictions timed for the latency
+predict_rows = 100_000
+latency_repeats = 200
+
+# Validation rows used for permutation importance (crime_model.py uses 20% of the data)
+valid_fraction = 0.2
+
+
+# Description: Features and crime rate of every city to resample synthetic tables from
+# Precondition: crime_census is an optional dict of {city: GeoDataFrame} that was already loaded,
+#               otherwise the crime_census_{city}.geojson files are read
+# Returns a DataFrame with feature_cols and crime_rate, or None if the crime_census files don't exist
+def load_source(crime_census = None, input_dir = pathlib.Path('crime_census')):
+    if crime_census is None:
+        paths = [input_dir / ('crime_census_' + city + '.geojson') for city in cities]
+        if not all(path.exists() for path in paths):
+            return None
+
+        import geopandas as gpd
+        crime_census = {city: gpd.read_file(path, columns = feature_cols + ['crime_rate'], ignore_geometry = True)
+                        for city, path in zip(cities, paths)}
+
+    source = pd.concat([crime_census[city][feature_cols + ['crime_rate']] for city in cities], ignore_index = True)
+    return pd.DataFrame(source).dropna().reset_index(drop = True)
+
+
+# Description: Generates a synthetic table of n rows with the columns of feature_cols and crime_rate
+# Precondition: source is an optional DataFrame from load_source
+#               Rows are resampled from it with noise of 5% of each column's standard deviation,
+#               otherwise features are skewed, correlated random values and crime_rate a noisy function of them
+# Returns (X, y) as float arrays
+def make_table(n, seed, source = None):
+    rng = np.random.default_rng(seed)
+
+    if source is not None:
+        rows = source.values[rng.integers(0, len(source), n)]
+        noise = rng.normal(0, 0.05, rows.shape) * source.values.std(axis = 0)
+        # Rates and ratios stay non-negative
+        table = np.abs(rows + noise)
+        return table[:, :-1], table[:, -1]
+
+    common = rng.normal(size = (n, 1))
+    X = np.exp(0.5 * common + 0.75 * rng.normal(size = (n, len(feature_cols))))
+    weights = np.linspace(-1, 1, len(feature_cols))
+    y = 0.05 * np.exp(np.log(X) @ weights / 4 + 0.3 * np.sin(3 * np.log(X[:, 0])) + 0.2 * rng.normal(size = n))
+    return X, y
+
+
+# Description: Peak memory of this process so far, in MB (ru_maxrss is KB on Linux and bytes on macOS)
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+# Description: Runs one measurement (in a fresh worker process)
+# Precondition: task is a dict with the model name, rows, jobs, seed and the source table (or None)
+# Returns a result row as a dict
+def measure(task):
+    X, y = make_table(task['rows'], task['seed'], task['source'])
+    X_new, _ = make_table(min(task['rows'], predict_rows), task['seed'] + 1, task['source'])
+
+    model = make_models(task['seed'])[task['model']]
+    if 'n_jobs' in model[-1].get_params():
+        model[-1].set_params(n_jobs = task['jobs'])
+
+    # Memory of the data alone, before anything is fitted
+    baseline_mb = peak_rss_mb()
+
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.predict(X_new)
+    predict_s = time.perf_counter() - start
+
+    latencies = []
+    for i in range(latency_repeats):
+        row = X_new[i % len(X_new)].reshape(1, -1)
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - start)
+
+    result = {'model' : task['model'], 'rows' : task['rows'], 'jobs' : task['jobs'],
+              'fit_s' : fit_s,
+              'predict_rows_per_s' : len(X_new) / predict_s,
+              'latency_ms_p50' : np.percentile(latencies, 50) * 1000,
+              'latency_ms_p95' : np.percentile(latencies, 95) * 1000,
+              'baseline_rss_mb' : baseline_mb,
+              'peak_rss_mb' : peak_rss_mb(),
+              'perm_importance_s' : np.nan,
+              'perm_added_rss_mb' : np.nan}
+
+    if task['permutation']:
+        # Same call as crime_model.py, on a validation table the size of its 20% split
+        X_valid, y_valid = make_table(max(2, int(task['rows'] * valid_fraction)), task['seed'] + 2, task['source'])
+        # ru_maxrss only ever goes up and doesn't count worker processes, so the repeats run on threads
+        # and the step's memory is how much it raises the peak
+        before_mb = peak_rss_mb()
+        start = time.perf_counter()
+        with parallel_backend('threading', n_jobs = task['jobs']):
+            permutation_importance(model, X_valid, y_valid, n_repeats = 10, random_state = 42, n_jobs = task['jobs'])
+        result['perm_importance_s'] = time.perf_counter() - start
+        result['perm_added_rss_mb'] = peak_rss_mb() - before_mb
+
+    return result
+
+
+# Description: Lists the configurations (jobs values) that make sense for a model
+#              Models without an n_jobs parameter are only run once per size
+def model_jobs(name, jobs):
+    if 'n_jobs' in make_models()[name][-1].get_params():
+        return list(jobs)
+    return [1]
+
+
+# Description: Estimates the fit time at n rows from the fits at smaller sizes
+# Precondition: fits is a non-empty list of (rows, fit time) in increasing rows, growth is the least power
+#               of the rows the fit time is expected to grow with
+# Returns the last fit time scaled up with the larger of growth and the power seen between the last two fits
+def estimate_fit(fits, n, growth = 1):
+    last_n, last_s = fits[-1]
+    if len(fits) > 1:
+        prev_n, prev_s = fits[-2]
+        if prev_s > 0 and last_s > 0:
+            growth = max(growth, np.log(last_s / prev_s) / np.log(last_n / prev_n))
+    return last_s * (n / last_n) ** growth
+
+
+# Description: Runs every (model, rows, jobs) measurement one after the other, each in its own process
+# Returns a DataFrame with one row per measurement (skipped ones have a reason in `skipped`)
+def run(rows, models, jobs = (1,), budget = 600, seed = 353, source = None, permutation = ('rand_f',)):
+    results = []
+    # fork would share the parent's memory, so a fresh interpreter is started for every measurement
+    context = multiprocessing.get_context('spawn')
+
+    for name in models:
+        # [(rows, fit time)] of the fits of each jobs configuration so far
+        fits = {}
+        for n in sorted(rows):
+            for n_jobs in model_jobs(name, jobs):
+                row = {'model' : name, 'rows' : n, 'jobs' : n_jobs}
+
+                skipped = None
+                if n > max_rows.get(name, n):
+                    skipped = 'over ' + str(max_rows[name]) + ' rows'
+                elif fits.get(n_jobs):
+                    # Don't start a fit that can't finish in time
+                    estimate = estimate_fit(fits[n_jobs], n, fit_growth.get(name, 1))
+                    if estimate > budget:
+                        last_n, last_s = fits[n_jobs][-1]
+                        skipped = f'fit estimated at {estimate:.0f} s, over {budget} s ({last_s:.1f} s at {last_n} rows)'
+                if skipped is not None:
+                    results.append({**row, 'skipped' : skipped})
+                    print(f'{name:<8}{n:>10,} rows  jobs={n_jobs:<3}skipped: {skipped}')
+                    continue
+
+                task = {**row, 'seed' : seed, 'source' : source, 'permutation' : name in permutation}
+                with ProcessPoolExecutor(max_workers = 1, mp_context = context) as pool:
+                    result = pool.submit(measure, task).result()
+                results.append({**result, 'skipped' : ''})
+                print(f'{name:<8}{n:>10,} rows  jobs={n_jobs:<3}fit {result["fit_s"]:9.2f} s  '
+                      f'predict {result["predict_rows_per_s"]:12,.0f} rows/s  '
+                      f'latency {result["latency_ms_p50"]:7.2f} ms  peak {result["peak_rss_mb"]:8.0f} MB')
+                if task['permutation']:
+                    print(f'{"":<8}{"":>10}       permutation importance {result["perm_importance_s"]:9.2f} s  '
+                          f'peak +{result["perm_added_rss_mb"]:7.0f} MB')
+
+                fits.setdefault(n_jobs, []).append((n, result['fit_s']))
+
+    return pd.DataFrame(results, columns = ['model', 'rows', 'jobs', 'fit_s', 'predict_rows_per_s',
+                                            'latency_ms_p50', 'latency_ms_p95', 'baseline_rss_mb',
+                                            'peak_rss_mb', 'perm_importance_s', 'perm_added_rss_mb', 'skipped'])
+
+
+# Description: Describes the machine and library versions of a run, saved next to its results
+def environment(args, source):
+    return {'date' : datetime.now().isoformat(timespec = 'seconds'),
+            'python' : platform.python_version(),
+            'numpy' : np.__version__,
+            'pandas' : pd.__version__,
+            'sklearn' : sklearn.__version__,
+            'platform' : platform.platform(),
+            'processor' : platform.processor(),
+            'cpus' : os.cpu_count(),
+            'data' : 'synthetic' if source is None else 'resampled from crime_census',
+            'rows' : args.rows, 'models' : args.models, 'jobs' : args.jobs,
+            'budget' : args.budget, 'seed' : args.seed}
+
+
+# Description: Compares two results files: how many times faster (or smaller) the second run is
+# Returns a DataFrame with the ratios of every measurement found in both files
+def compare(before_path, after_path):
+    keys = ['model', 'rows', 'jobs']
+    before = pd.read_csv(before_path)
+    after = pd.read_csv(after_path)
+    both = before.merge(after, on = keys, suffixes = ('_before', '_after'))
+
+    # Ratios above 1 are improvements
+    ratios = both[keys].copy()
+    ratios['fit_speedup'] = both['fit_s_before'] / both['fit_s_after']
+    ratios['predict_speedup'] = both['predict_rows_per_s_after'] / both['predict_rows_per_s_before']
+    ratios['latency_speedup'] = both['latency_ms_p50_before'] / both['latency_ms_p50_after']
+    ratios['perm_importance_speedup'] = both['perm_importance_s_before'] / both['perm_importance_s_after']
+    ratios['memory_ratio'] = both['peak_rss_mb_before'] / both['peak_rss_mb_after']
+    return ratios
+
+
+# Precondition: crime_census is an optional dict of {city: GeoDataFrame} that was already loaded
+#               (e.g. by run_analysis.py), otherwise the crime_census_{city}.geojson files are read
+def main(crime_census=None, args=None):
+    parser = argparse.ArgumentParser(description = 'Benchmark fit/predict time and memory of the models.')
+    parser.add_argument('--rows', type = int, nargs = '+', default = [1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--models', nargs = '+', choices = list(make_models()), default = list(make_models()))
+    parser.add_argument('--jobs', type = int, nargs = '+', default = [1],
+                        help = 'n_jobs configurations for the models that support it')
+    parser.add_argument('--budget', type = float, default = 600,
+                        help = 'skip a size if its estimated fit time is longer than this (seconds)')
+    parser.add_argument('--seed', type = int, default = 353)
+    parser.add_argument('--synthetic', action = 'store_true',
+                        help = 'generate random features instead of resampling the crime_census data')
+    parser.add_argument('--name', default = None, help = 'name of the results files (default: date and time)')
+    parser.add_argument('--compare', nargs = 2, metavar = ('BEFORE', 'AFTER'), help = 'compare two results files')
+    args = parser.parse_args(args)
+
+    if args.compare:
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(compare(*args.compare).round(2).to_string(index = False))
+        return
+
+    source = None if args.synthetic else load_source(crime_census)
+    results = run(args.rows, args.models, jobs = args.jobs, budget = args.budget, seed = args.seed, source = source)
+
+    name = args.name or datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs(output_dir, exist_ok = True)
+    results.to_csv(output_dir / (name + '.csv'), index = False)
+    with open(output_dir / (name + '.json'), 'w') as f:
+        json.dump(environment(args, source), f, indent = 2)
+    print('\nResults saved in ' + str(output_dir / (name + '.csv')))
+
+
+if __name__ == '__main__':
+    main()
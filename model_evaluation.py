@@ -0,0 +1,209 @@
+# CMPT 353 - Final Project
+# Authors: Benley Hsiang
+#          April Nguyen
+#          Gia Hue (Hayden) Mai
+#
+# Description: Evaluates the four models of crime_model.py with repeated cross-validation instead of a
+#              single unseeded train_test_split, so the scores are stable from run to run.
+#              Two schemes:
+#               - kfold: repeated k-fold over the combined data of the 3 cities (stratified by city so every
+#                        fold has each city), scored on the whole validation fold and on each city's part of it
+#               - loco:  leave-one-city-out, train on two cities and validate on the third, repeated with
+#                        different seeds. This is the question "do the demographics of one city transfer?"
+#              Every (scheme, repeat, fold) split is scaled once and the fitted scaler is shared by the 4 models,
+#              then all (split x model) fits run in parallel across cores with joblib.
+#              Prints the mean R^2 score with a 95% confidence interval per model and city, and saves
+#              every score and the summary in the model_evaluation folder.
+#              The k-fold intervals use the Nadeau-Bengio corrected variance, since the training sets of
+#              repeated folds overlap. The leave-one-city-out splits are the same in every repeat, so their
+#              intervals only show how much the scores vary with the models' random seed.
+#              Uses the crime_census_{city}.geojson data created by data_processing.py
+#
+# Usage: python3 model_evaluation.py [--folds 5] [--repeats 10] [--jobs -1] [--seed 353] [--schemes kfold loco]
+#
+# model_evaluation.py
+# Last modified: October 19, 2026
+
+import os
+import argparse
+import pathlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from scipy import stats
+from joblib import Parallel, delayed
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import RepeatedStratifiedKFold
+from sklearn.metrics import r2_score
+from crime_model import make_models
+from data_processing import feature_cols
+
+cities = {'van' : 'Vancouver', 'tor' : 'Toronto', 'mon' : 'Montreal'}
+model_names = {'gauss' : 'Gaussian Regressor',
+               'kNN' : 'kNN Regressor',
+               'rand_f' : 'Random Forest Regressor',
+               'grad_b' : 'Gradient Boosting Regressor'}
+
+
+# Description: Stacks the features and crime rate of every city into arrays
+# Precondition: crime_census is a dict of {city: GeoDataFrame}
+# Returns X (n x features), y (n), and the city of each row
+def stack_cities(crime_census, features = feature_cols):
+    X = np.concatenate([crime_census[city][features].values for city in cities])
+    y = np.concatenate([crime_census[city]['crime_rate'].values for city in cities])
+    city = np.concatenate([np.repeat(city, len(crime_census[city])) for city in cities])
+    return X, y, city
+
+
+# Description: Lists the train/validation splits of a scheme
+# Returns a list of dicts with the scheme, repeat, fold, seed for the models, and train/valid row indices
+def make_splits(scheme, city, folds, repeats, seed):
+    splits = []
+    if scheme == 'kfold':
+        rskf = RepeatedStratifiedKFold(n_splits = folds, n_repeats = repeats, random_state = seed)
+        for i, (train, valid) in enumerate(rskf.split(np.zeros(len(city)), city)):
+            splits.append({'scheme' : scheme, 'repeat' : i // folds, 'fold' : i % folds,
+                           'seed' : seed + i // folds, 'train' : train, 'valid' : valid})
+    elif scheme == 'loco':
+        for repeat in range(repeats):
+            for held_out in cities:
+                splits.append({'scheme' : scheme, 'repeat' : repeat, 'fold' : held_out,
+                               'seed' : seed + repeat,
+                               'train' : np.flatnonzero(city != held_out),
+                               'valid' : np.flatnonzero(city == held_out)})
+    else:
+        raise ValueError('unknown scheme: ' + scheme)
+    return splits
+
+
+# Description: Fits a scaler on the training rows of a split and scales both sides with it
+# Returns (scaled training features, scaled validation features)
+def scale_split(X, split):
+    scaler = StandardScaler().fit(X[split['train']])
+    return scaler.transform(X[split['train']]), scaler.transform(X[split['valid']])
+
+
+# Description: Fits one model on one split (run in a worker) and scores it overall and per city
+# Precondition: X_train, X_valid are already scaled, the model's own StandardScaler step is skipped
+# Returns a list of score rows
+def fit_score(name, split, X_train, y_train, X_valid, y_valid, city_valid):
+    # Last step of the pipeline is the regressor, the scaler was fitted once for this split
+    model = make_models(split['seed'])[name][-1]
+    model.fit(X_train, y_train)
+    predicted = model.predict(X_valid)
+
+    rows = []
+    groups = [('all', np.ones(len(y_valid), dtype = bool))]
+    if split['scheme'] == 'kfold':
+        groups += [(city, city_valid == city) for city in cities]
+    else:
+        groups = [(split['fold'], groups[0][1])]
+
+    for group, rows_in_group in groups:
+        rows.append({'scheme' : split['scheme'], 'repeat' : split['repeat'], 'fold' : split['fold'],
+                     'model' : name, 'city' : group,
+                     'n_train' : len(y_train), 'n_valid' : len(y_valid),
+                     'r2' : r2_score(y_valid[rows_in_group], predicted[rows_in_group])})
+    return rows
+
+
+# Description: Whether a fitted regressor changes with its random_state
+#              A seed alone isn't enough: e.g. gradient boosting with subsample = 1 and max_features = None
+#              fits the same trees for every seed, only bootstrapping or sampling rows or features is random
+def is_random(regressor):
+    params = regressor.get_params()
+    if params.get('random_state') is None:
+        return False
+    return bool(params.get('bootstrap', False)) or params.get('subsample', 1.0) < 1 \
+        or params.get('max_features', None) not in (None, 1.0)
+
+
+# Description: Runs every (split x model) fit of the given schemes in parallel
+# Precondition: crime_census is a dict of {city: GeoDataFrame}
+# Returns a DataFrame with one row per (scheme, repeat, fold, model, city) score
+def evaluate(crime_census, schemes = ('kfold', 'loco'), folds = 5, repeats = 10, seed = 353, n_jobs = -1,
+             features = feature_cols, models = model_names):
+    X, y, city = stack_cities(crime_census, features)
+
+    # Leave-one-city-out splits are the same in every repeat, only the models whose fit depends on the seed need repeating
+    seeded = {name for name, model in make_models(seed).items() if is_random(model[-1])}
+
+    tasks = []
+    for scheme in schemes:
+        for split in make_splits(scheme, city, folds, repeats, seed):
+            # Scaled once per split, shared by every model
+            X_train, X_valid = scale_split(X, split)
+            for name in models:
+                if split['scheme'] == 'loco' and split['repeat'] > 0 and name not in seeded:
+                    continue
+                tasks.append(delayed(fit_score)(name, split, X_train, y[split['train']],
+                                                X_valid, y[split['valid']], city[split['valid']]))
+
+    results = Parallel(n_jobs = n_jobs)(tasks)
+    return pd.DataFrame([row for rows in results for row in rows])
+
+
+# Description: Mean score of every (scheme, model, city) with a 95% t confidence interval
+#              k-fold: the variance over the folds is corrected for the overlap of the training sets
+#                      (Nadeau & Bengio, 2003): var * (1/J + n_valid/n_train), J the number of scores
+#              loco:   plain t interval over the repeats, i.e. over the models' random seeds only
+#              The interval is NaN when it can't be calculated (a single score, or scores that don't vary)
+# Returns a DataFrame
+def summarize(scores, confidence = 0.95):
+    summary = scores.groupby(['scheme', 'model', 'city'], sort = False) \
+                    .agg(mean = ('r2', 'mean'), std = ('r2', 'std'), count = ('r2', 'count'),
+                         n_train = ('n_train', 'mean'), n_valid = ('n_valid', 'mean'))
+
+    variance_factor = np.where(summary.index.get_level_values('scheme') == 'kfold',
+                               1 / summary['count'] + summary['n_valid'] / summary['n_train'],
+                               1 / summary['count'])
+    half_width = stats.t.ppf(0.5 + confidence / 2, summary['count'] - 1) * summary['std'] * np.sqrt(variance_factor)
+    half_width = half_width.where((summary['count'] > 1) & (summary['std'] > 0))
+
+    summary['ci_low'] = summary['mean'] - half_width
+    summary['ci_high'] = summary['mean'] + half_width
+    return summary.drop(columns = ['n_train', 'n_valid']).reset_index()
+
+
+# Description: Prints the summary in the same layout as crime_model.py
+def print_summary(summary):
+    for (scheme, city), group in summary.groupby(['scheme', 'city'], sort = False):
+        if scheme == 'kfold':
+            title = 'Repeated k-fold, validating with ' + ('all data' if city == 'all' else cities[city] + ' data')
+        else:
+            title = 'Leave-one-city-out, trained on the other cities, validating with ' + cities[city] + ' data' \
+                    + '\n(intervals show the variation over random seeds only, not sampling uncertainty)'
+        print('\n' + title + ':\n')
+        for row in group.itertuples():
+            interval = 'n/a' if np.isnan(row.ci_low) else f'{row.ci_low:.3f} to {row.ci_high:.3f}'
+            print(f'{model_names[row.model] + ":":<30}{row.mean:.3f}  (95% CI {interval})')
+
+
+# Precondition: crime_census is an optional dict of {city: GeoDataFrame} that was already loaded
+#               (e.g. by run_analysis.py), otherwise the crime_census_{city}.geojson files are read
+def main(crime_census=None, args=None):
+    parser = argparse.ArgumentParser(description = 'Repeated and leave-one-city-out cross-validation of the models.')
+    parser.add_argument('--folds', type = int, default = 5)
+    parser.add_argument('--repeats', type = int, default = 10)
+    parser.add_argument('--jobs', type = int, default = -1, help = 'processes to use (default: all cores)')
+    parser.add_argument('--seed', type = int, default = 353)
+    parser.add_argument('--schemes', nargs = '+', choices = ['kfold', 'loco'], default = ['kfold', 'loco'])
+    args = parser.parse_args(args)
+
+    if crime_census is None:
+        input_dir = pathlib.Path('crime_census')
+        crime_census = {city: gpd.read_file(input_dir / ('crime_census_' + city + '.geojson')) for city in cities}
+
+    scores = evaluate(crime_census, schemes = args.schemes, folds = args.folds, repeats = args.repeats,
+                      seed = args.seed, n_jobs = args.jobs)
+    summary = summarize(scores)
+    print_summary(summary)
+
+    output_dir = pathlib.Path('model_evaluation')
+    os.makedirs(output_dir, exist_ok = True)
+    scores.to_csv(output_dir / 'scores.csv', index = False)
+    summary.to_csv(output_dir / 'summary.csv', index = False)
+
+
+if __name__ == '__main__':
+    main()
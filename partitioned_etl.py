@@ -0,0 +1,220 @@
+# CMPT 353 - Final Project
+# Authors: Benley Hsiang
+#          April Nguyen
+#          Gia Hue (Hayden) Mai
+#
+# Description: Partitioned, out-of-core version of the ETL in data_processing.py for when the crime
+#              records of every city don't fit in memory together (e.g. every CMA in Canada).
+#              Produces the same crime_census_{city}.geojson files as data_processing.py.
+#               1. Spill: each city's crimes of every year are streamed in chunks (from crime_store.py if it was
+#                  built, otherwise the raw archive cleaned with data_processing.clean_crimes), and their points,
+#                  type, year, month and hour are written to disk split by grid cell.
+#                  The census tracts near each cell are written next to them.
+#               2. Count: every (city, cell) partition is a separate task run in a process pool. A task
+#                  loads only its own crimes and tracts, finds the nearest tract of each crime and
+#                  returns the crime count of the year per tract, and the counts of its cells of the
+#                  crime cube (crime_cube.py).
+#               3. Merge: counts from the partitions are added up per tract and joined to the census,
+#                  then features are calculated the same way as data_processing.py.
+#                  The cube counts of the partitions are added up into each city's crime cube.
+#              Memory used by a task is bounded by the size of a partition (cell_size), not the whole city.
+#
+#              Why the nearest tract found in a partition is the right one:
+#              tracts are written to a cell if they are within `halo` metres of it, so any tract within
+#              `halo` of a crime in that cell is in the partition. Crimes with no tract that close are
+#              rare (outside the city boundary), they are sent back and matched against every tract.
+#
+# Usage: python3 partitioned_etl.py [--cell-size METRES] [--halo METRES] [--workers N] [--chunksize ROWS]
+#
+# partitioned_etl.py
+# Last modified: October 19, 2026
+
+import os
+import argparse
+import pathlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_processing import city_epsg, crime_time_cols, load_census, iter_crimes, assign_tracts, save_crime_census
+import crime_cube
+
+cities = ['van', 'tor', 'mon']
+
+
+# Description: Square grid of cells covering the census tracts of a city, expanded by halo on every side
+#              Crimes outside of the grid are further than halo from every tract
+# Returns a dict with the grid origin, cell size and number of columns/rows
+def make_grid(census, cell_size, halo):
+    minx, miny, maxx, maxy = census.total_bounds
+    minx, miny, maxx, maxy = minx - halo, miny - halo, maxx + halo, maxy + halo
+    return {'minx' : minx, 'miny' : miny, 'cell_size' : cell_size,
+            'ncols' : max(1, int(np.ceil((maxx - minx) / cell_size))),
+            'nrows' : max(1, int(np.ceil((maxy - miny) / cell_size)))}
+
+
+# Description: Finds the grid cell of each point
+# Returns an array of cell ids, -1 for points outside of the grid (or without coordinates)
+def cell_ids(x, y, grid):
+    col = np.floor((x - grid['minx']) / grid['cell_size'])
+    row = np.floor((y - grid['miny']) / grid['cell_size'])
+    inside = (col >= 0) & (col < grid['ncols']) & (row >= 0) & (row < grid['nrows'])
+    return np.where(inside, row * grid['ncols'] + col, -1).astype(np.int64)
+
+
+# Description: Bounding box of a cell expanded by halo
+# Returns (minx, miny, maxx, maxy)
+def cell_bounds(cell, grid, halo):
+    row, col = divmod(cell, grid['ncols'])
+    minx = grid['minx'] + col * grid['cell_size']
+    miny = grid['miny'] + row * grid['cell_size']
+    return (minx - halo, miny - halo, minx + grid['cell_size'] + halo, miny + grid['cell_size'] + halo)
+
+
+# Description: Streams a city's crimes of every year to disk, one parquet dataset partitioned by grid cell
+#              Only the projected coordinates, type, year, month and hour are kept, so a chunk in memory is small
+# Precondition: grid was made by make_grid for the city's census
+# Returns the set of cells that received crimes (-1 for crimes outside of the grid)
+def spill_crimes(city, input_dir, grid, spill_dir, chunksize):
+    crimes_dir = spill_dir / city / 'crimes'
+    cells = set()
+
+    for crimes in iter_crimes(city, input_dir, year = None, chunksize = chunksize):
+        crimes = crimes[crimes.geometry.notna()]
+        if len(crimes) == 0:
+            continue
+
+        x = crimes.geometry.x.values
+        y = crimes.geometry.y.values
+        cell = cell_ids(x, y, grid)
+        cells.update(np.unique(cell).tolist())
+
+        table = pa.table({'x' : x, 'y' : y,
+                          'type' : crimes['type'].astype(object).fillna('Unknown').values.astype(str),
+                          'year' : crimes['year'].values.astype(np.int16),
+                          'month' : crimes['month'].values.astype(np.int16),
+                          'hour' : crimes['hour'].values.astype(np.int16),
+                          'cell' : cell})
+        pq.write_to_dataset(table, crimes_dir, partition_cols = ['cell'])
+
+    return cells
+
+
+# Description: Writes the tracts within halo of each cell to disk, one GeoParquet file per cell
+# Precondition: census is projected in the city's EPSG
+# Returns a dict of {cell: path of the tracts file}
+def spill_tracts(city, census, cells, grid, halo, spill_dir):
+    tracts_dir = spill_dir / city / 'tracts'
+    os.makedirs(tracts_dir, exist_ok = True)
+    tracts = census[['name', 'geometry']]
+
+    paths = {}
+    for cell in cells:
+        if cell < 0:
+            continue
+        minx, miny, maxx, maxy = cell_bounds(cell, grid, halo)
+        near = tracts.iloc[tracts.sindex.query(shapely.box(minx, miny, maxx, maxy))]
+        paths[cell] = tracts_dir / ('cell=' + str(cell) + '.parquet')
+        near.to_parquet(paths[cell])
+
+    return paths
+
+
+# Description: Counts the crimes of one partition per census tract (run in a worker process)
+# Precondition: task is (city, cell, crimes directory, tracts file, halo, year)
+# Returns (city, Series of the year's crime counts indexed by tract name, Series of crime cube counts
+#          (crime_cube.count_cells), DataFrame of the crimes with no tract within halo)
+def count_partition(task):
+    city, cell, crimes_path, tracts_path, halo, year = task
+    crimes = pd.read_parquet(crimes_path, columns = ['x', 'y'] + crime_time_cols)
+    points = gpd.GeoDataFrame(geometry = gpd.points_from_xy(crimes.x, crimes.y), crs = city_epsg[city])
+
+    if tracts_path is None:
+        names = pd.Series(index = points.index, dtype = object)
+    else:
+        names = assign_tracts(points, gpd.read_parquet(tracts_path), max_distance = halo)
+
+    orphans = names.isna().values
+    counts = names[crimes.year.values == year].dropna().value_counts()
+    return city, counts, crime_cube.count_cells(crimes, names), crimes[orphans]
+
+
+# Description: Runs the partitioned ETL for the given cities
+# Precondition: year is the year of crimes of the crime_census data (the crime cubes have every year)
+# Returns a dict of {city: GeoDataFrame} with the same data as the saved crime_census_{city}.geojson
+def run(cities = cities, input_dir = pathlib.Path('datasets'), output_dir = pathlib.Path('crime_census'),
+        cell_size = 5000, halo = 1000, workers = None, chunksize = 100_000, spill_dir = None, year = 2021):
+    os.makedirs(output_dir, exist_ok = True)
+
+    with tempfile.TemporaryDirectory(dir = spill_dir) as tmp:
+        tmp = pathlib.Path(tmp)
+
+        # 1. Spill the crimes and tracts of every city to disk, partitioned by grid cell
+        census = {}
+        tasks = []
+        for city in cities:
+            census[city] = load_census(city, input_dir)
+            grid = make_grid(census[city], cell_size, halo)
+            cells = spill_crimes(city, input_dir, grid, tmp, chunksize)
+            tract_paths = spill_tracts(city, census[city], cells, grid, halo, tmp)
+
+            for cell in sorted(cells):
+                tasks.append((city, cell, tmp / city / 'crimes' / ('cell=' + str(cell)),
+                              tract_paths.get(cell), halo, year))
+
+        # 2. Count every partition in parallel
+        counts = {city: [] for city in cities}
+        cube_counts = {city: [] for city in cities}
+        orphans = {city: [] for city in cities}
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            for city, cell_counts, cell_cube_counts, cell_orphans in pool.map(count_partition, tasks):
+                counts[city].append(cell_counts)
+                cube_counts[city].append(cell_cube_counts)
+                if len(cell_orphans):
+                    orphans[city].append(cell_orphans)
+
+    # 3. Merge the partitions of each city into the crime_census schema
+    crime_census = {}
+    for city in cities:
+        # Crimes that no partition could place are matched against every tract, like data_processing.py
+        if orphans[city]:
+            leftover = pd.concat(orphans[city], ignore_index = True)
+            names = assign_tracts(gpd.GeoDataFrame(leftover, geometry = gpd.points_from_xy(leftover.x, leftover.y),
+                                                   crs = city_epsg[city]), census[city])
+            counts[city].append(names[leftover.year.values == year].value_counts())
+            cube_counts[city].append(crime_cube.count_cells(leftover, names))
+
+        city_counts = pd.concat(counts[city]).groupby(level = 0).sum() if counts[city] else pd.Series(dtype = int)
+        city_counts = city_counts.rename('crime_count').rename_axis('name').reset_index()
+
+        # Same joins as census_crime_count: tracts without crimes get a count of 0
+        crimes_census = city_counts.merge(census[city]['name'], on = ['name'], how = 'outer')
+        crimes_census['crime_count'] = crimes_census['crime_count'].fillna(0)
+        crimes_census = crimes_census.merge(census[city], on = 'name', how = 'inner')
+
+        crime_census[city] = save_crime_census(crimes_census, output_dir / ('crime_census_' + city + '.geojson'))
+        crime_cube.save_cube(crime_cube.cube_from_counts(city, census[city], cube_counts[city]), output_dir)
+
+    return crime_census
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Partitioned out-of-core ETL of the crime and census data.')
+    parser.add_argument('--cell-size', type = float, default = 5000, help = 'width of a partition in metres')
+    parser.add_argument('--halo', type = float, default = 1000,
+                        help = 'tracts within this many metres of a partition are loaded with it')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of processes (default: all cores)')
+    parser.add_argument('--chunksize', type = int, default = 100_000, help = 'crime records read at a time')
+    parser.add_argument('--spill-dir', default = None, help = 'where partitions are written (default: system temp)')
+    args = parser.parse_args()
+
+    run(cell_size = args.cell_size, halo = args.halo, workers = args.workers,
+        chunksize = args.chunksize, spill_dir = args.spill_dir)
+
+
+if __name__ == '__main__':
+    main()
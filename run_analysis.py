@@ -0,0 +1,200 @@
+# CMPT 353 - Final Project
+# Authors: Benley Hsiang
+#          April Nguyen
+#          Gia Hue (Hayden) Mai
+#
+# Description: Single entry point for the whole project.
+#              Each step is a subcommand and its module is only imported when the step runs,
+#              so e.g. "map" never pays for importing sklearn or statsmodels.
+#                   store   - crime_store.py, converts the raw crime archives once
+#                   etl     - data_processing.py (or partitioned_etl.py with --partitioned)
+#                   plots   - initial_plots.py
+#                   stats   - stats_analysis.py and spatial_stats.py
+#                   model   - crime_model.py
+#                   map     - vancouver_crime_map.py
+#                   all     - every step above in one interpreter
+#                   evaluate - model_evaluation.py, repeated and leave-one-city-out cross-validation (not in "all")
+#                   benchmark - model_benchmark.py, fit/predict time and memory of the models from 1k to 1M rows (not in "all")
+#                   features - feature_selection.py, drop-one and forward selection of the features (not in "all")
+#              Datasets are loaded at most once per run and shared between steps:
+#               - crimedata_van.zip is read once for both the ETL and the map
+#               - the crime_census_{city} data produced by the ETL is handed straight to the analyses
+#                 (or read once from crime_census if the ETL is skipped)
+#              --years/--months/--hours/--types replace crime_rate with the rate of that slice of the
+#              crime cubes (crime_cube.py) in every analysis, e.g. crimes of the summer of 2019:
+#                   python3 run_analysis.py stats --years 2019 --months 6 7 8
+#              A slice is only checked against the cities a step uses: plots only uses Vancouver, so e.g.
+#                   python3 run_analysis.py plots --hours 22 23 0 1 2 3 4 5 --types "Break and Enter Residential/Other"
+#              works, but the other analyses compare all 3 cities, so a slice that one of them doesn't record
+#              (e.g. --hours, since Montreal has no hour, or a crime type named differently in another city)
+#              stops the run instead of giving that city a crime rate of 0.
+#
+# Usage: python3 run_analysis.py {store,etl,plots,stats,model,map,all,evaluate,benchmark,features} [--skip-etl] [--partitioned]
+#                                [--years Y ...] [--months M ...] [--hours H ...] [--types TYPE ...]
+#
+# run_analysis.py
+# Last modified: October 19, 2026
+
+import argparse
+import importlib
+import pathlib
+import sys
+
+cities = ['van', 'tor', 'mon']
+
+
+# Description: Imports a project module the first time a step needs it
+# Returns the module
+def load_module(name):
+    return importlib.import_module(name)
+
+
+# Description: Closes any figure left open by a step so the next step starts from a clean pyplot state
+def close_figures():
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].close('all')
+
+
+# Description: Returns the raw Vancouver crime data, reading crimedata_van.zip on first use
+#              Returns None if the crime store was built (crime_store.py), each step then reads
+#              only the columns it needs from it, which is cheaper than sharing the whole archive
+# Precondition: loaded is the dict of datasets already in memory for this run
+def crimes_van(loaded):
+    if 'crimes_van' not in loaded:
+        if load_module('crime_store').has_city('van'):
+            loaded['crimes_van'] = None
+        else:
+            import pandas as pd
+            loaded['crimes_van'] = pd.read_csv(pathlib.Path('datasets') / 'crimedata_van.zip', compression = 'zip')
+    return loaded['crimes_van']
+
+
+# Description: Returns the crime_census data of the cities a step uses, reading the GeoJSON files on first use
+#              If a slice of the crime cubes was asked for (loaded['crime_slice']), crime_rate is the rate of that slice
+#              Stops the run if one of the cities doesn't record the slice
+# Precondition: loaded is the dict of datasets already in memory for this run
+#               step is the name of the step, step_cities the cities it uses
+def crime_census(loaded, step, step_cities = cities):
+    if 'crime_census' not in loaded:
+        import geopandas as gpd
+        input_dir = pathlib.Path('crime_census')
+        loaded['crime_census'] = {city: gpd.read_file(input_dir / ('crime_census_' + city + '.geojson'))
+                                  for city in cities}
+
+    if not loaded.get('crime_slice'):
+        return loaded['crime_census']
+
+    # The ETL replaces crime_census, so the slice is recalculated from it
+    if loaded.get('sliced_from') is not loaded['crime_census']:
+        loaded['sliced_from'] = loaded['crime_census']
+        loaded['crime_census_sliced'] = {}
+
+    # Each city is only sliced the first time a step needs it
+    sliced = loaded['crime_census_sliced']
+    to_slice = {city: loaded['crime_census'][city] for city in step_cities if city not in sliced}
+    sliced.update(load_module('crime_cube').apply_slice(to_slice, loaded['crime_slice']))
+
+    left_out = [city for city in step_cities if city not in sliced]
+    if left_out:
+        sys.exit('The crime data of ' + ', '.join(left_out) + ' has none of ' + str(loaded['crime_slice'])
+                 + ', and ' + step + ' compares ' + ', '.join(step_cities))
+    return {city: sliced[city] for city in step_cities}
+
+
+def run_etl(loaded, partitioned = False):
+    if partitioned:
+        # Streams the crime archives itself, nothing to share
+        loaded['crime_census'] = load_module('partitioned_etl').run()
+    else:
+        loaded['crime_census'] = load_module('data_processing').main(crimes_van = crimes_van(loaded))
+
+
+def run_store(loaded):
+    load_module('crime_store').main([])
+
+
+def run_plots(loaded):
+    # Only plots Vancouver
+    load_module('initial_plots').main(crime_census = crime_census(loaded, 'plots', ['van']))
+
+
+def run_stats(loaded):
+    load_module('stats_analysis').main(crime_census = crime_census(loaded, 'stats'))
+    close_figures()
+    load_module('spatial_stats').main(crime_census = crime_census(loaded, 'stats'))
+
+
+def run_model(loaded):
+    load_module('crime_model').main(crime_census = crime_census(loaded, 'model'))
+
+
+def run_map(loaded):
+    load_module('vancouver_crime_map').main(crimes_van = crimes_van(loaded))
+
+
+def run_evaluate(loaded):
+    load_module('model_evaluation').main(crime_census = crime_census(loaded, 'evaluate'), args = [])
+
+
+def run_benchmark(loaded):
+    load_module('model_benchmark').main(crime_census = crime_census(loaded, 'benchmark'), args = [])
+
+
+def run_features(loaded):
+    load_module('feature_selection').main(crime_census = crime_census(loaded, 'features'), args = [])
+
+
+# Run in this order by "all"
+steps = {'etl' : run_etl,
+         'plots' : run_plots,
+         'stats' : run_stats,
+         'model' : run_model,
+         'map' : run_map,
+         }
+
+# Only run on their own: the crime store is built once, and the others take much longer than the rest
+other_commands = {'store' : run_store,
+                  'evaluate' : run_evaluate,
+                  'benchmark' : run_benchmark,
+                  'features' : run_features,
+                  }
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Run the Vancouver crime census project.')
+    parser.add_argument('command', choices = list(steps) + ['all'] + list(other_commands),
+                        help = 'step to run, or "all" to run every step in one process')
+    parser.add_argument('--skip-etl', action = 'store_true',
+                        help = 'with "all", reuse the existing crime_census files instead of rerunning the ETL')
+    parser.add_argument('--partitioned', action = 'store_true',
+                        help = 'run the ETL out-of-core, partitioned by area and in parallel (partitioned_etl.py)')
+    parser.add_argument('--years', type = int, nargs = '+', help = 'crime rate of these years only')
+    parser.add_argument('--months', type = int, nargs = '+', help = 'crime rate of these months only (1-12)')
+    parser.add_argument('--hours', type = int, nargs = '+', help = 'crime rate of these hours of the day only (0-23)')
+    parser.add_argument('--types', nargs = '+', help = 'crime rate of these crime types only')
+    args = parser.parse_args()
+
+    # Datasets in memory, shared by every step of this run
+    loaded = {'crime_slice' : {name: getattr(args, name) for name in ['years', 'months', 'hours', 'types']
+                               if getattr(args, name) is not None}}
+
+    if args.command in other_commands:
+        other_commands[args.command](loaded)
+        return
+
+    if args.command == 'all':
+        to_run = [step for step in steps if not (step == 'etl' and args.skip_etl)]
+    else:
+        to_run = [args.command]
+
+    for step in to_run:
+        print(f'\n===== {step} =====')
+        if step == 'etl':
+            run_etl(loaded, partitioned = args.partitioned)
+        else:
+            steps[step](loaded)
+        close_figures()
+
+
+if __name__ == '__main__':
+    main()
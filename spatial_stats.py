@@ -0,0 +1,262 @@
+# CMPT 353 - Final Project
+# Authors: Benley Hsiang
+#          April Nguyen
+#          Gia Hue (Hayden) Mai
+#
+# Description: Spatial autocorrelation statistics on the census tracts.
+#              The OLS model in stats_analysis.py assumes the residuals are independent, but
+#              neighbouring census tracts are not. This checks that assumption using Moran's I.
+#               - Builds sparse spatial weights matrices (scipy.sparse CSR) from the tract geometries
+#                   - contiguity (queen/rook) weights found with a spatial index (STRtree)
+#                   - k-nearest-neighbour weights found with a KD-tree on a point inside each tract
+#               - Global Moran's I and Local Moran's I (LISA) on crime_rate and on the OLS residuals
+#                   - permutation inference is vectorized over the sparse matrix, no loop per tract
+#              Uses the crime_census_{city}.geojson data created by data_processing.py
+#
+# spatial_stats.py
+# Last modified: October 19, 2026
+
+import os
+import pathlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from scipy import sparse
+from scipy.spatial import cKDTree
+import statsmodels.api as sm
+from data_processing import city_epsg, ols_cols
+
+# Maximum number of doubles held in memory at once by the permutation tests (~64 MB)
+PERMUTATION_BLOCK = 8_000_000
+
+OUTPUT_TEMPLATE = (
+    '{label:<24}'
+    'I = {I:>8.4f}   '
+    'E[I] = {EI:>8.4f}   '
+    'z = {z_sim:>8.3f}   '
+    'p = {p_sim:.4f}'
+)
+
+
+# Description: Projects tracts into a metric CRS so distances and centroids are in metres
+# Precondition: tracts is a GeoDataFrame, city is a key of city_epsg (or None to estimate a UTM zone)
+# Returns the projected GeoDataFrame
+def project_tracts(tracts, city = None):
+    if city in city_epsg:
+        epsg = city_epsg[city]
+    else:
+        epsg = tracts.estimate_utm_crs()
+
+    if tracts.crs is None or tracts.crs == epsg:
+        return tracts
+    return tracts.to_crs(epsg)
+
+
+# Description: Builds a binary contiguity weights matrix from polygon geometries
+#              Candidate neighbours come from a bulk STRtree query, so only tracts whose
+#              bounding boxes overlap are tested instead of all n^2 pairs.
+#              queen: tracts sharing at least one boundary point are neighbours
+#              rook: tracts must share a boundary segment (not only a corner)
+# Precondition: geometry is a GeoSeries (or array) of polygons
+# Returns an n x n scipy.sparse CSR matrix of 0/1 weights
+def contiguity_weights(geometry, rook = False):
+    geoms = np.asarray(geometry.values if hasattr(geometry, 'values') else geometry)
+    n = len(geoms)
+
+    tree = shapely.STRtree(geoms)
+    left, right = tree.query(geoms, predicate = 'intersects')
+
+    # Remove self pairs
+    keep = left != right
+    left, right = left[keep], right[keep]
+
+    if rook:
+        # Shared boundary must have a length, a single shared corner doesn't count
+        shared = shapely.intersection(shapely.boundary(geoms[left]), shapely.boundary(geoms[right]))
+        keep = shapely.length(shared) > 0
+        left, right = left[keep], right[keep]
+
+    return sparse.csr_matrix((np.ones(len(left)), (left, right)), shape = (n, n))
+
+
+# Description: Builds a k-nearest-neighbour weights matrix from a representative point of each geometry
+# Precondition: geometry is a GeoSeries in a projected (metric) CRS, k < number of geometries
+# Returns an n x n scipy.sparse CSR matrix of 0/1 weights (not symmetric in general)
+def knn_weights(geometry, k = 6):
+    points = geometry.representative_point() if hasattr(geometry, 'representative_point') \
+             else shapely.point_on_surface(geometry)
+    coords = shapely.get_coordinates(np.asarray(points))
+    n = len(coords)
+
+    # k + 1 because the closest point of each tract is itself
+    _, neighbours = cKDTree(coords).query(coords, k = k + 1)
+    neighbours = neighbours[:, 1:]
+
+    rows = np.repeat(np.arange(n), k)
+    return sparse.csr_matrix((np.ones(n * k), (rows, neighbours.ravel())), shape = (n, n))
+
+
+# Description: Row standardizes a weights matrix so each row sums to 1
+#              Islands (tracts without neighbours) are left as rows of 0
+# Precondition: w is a scipy.sparse matrix
+# Returns a new CSR matrix
+def row_standardize(w):
+    w = sparse.csr_matrix(w, dtype = float, copy = True)
+    row_sums = np.asarray(w.sum(axis = 1)).ravel()
+    row_sums[row_sums == 0] = 1
+    w.data /= np.repeat(row_sums, np.diff(w.indptr))
+    return w
+
+
+# Description: Pseudo p-value of a permutation test (one-sided, in the direction of the observed value)
+# Precondition: sims has the simulated statistics along axis 0, observed broadcasts against sims[0]
+# Returns the p-value(s)
+def _pseudo_p(sims, observed):
+    permutations = sims.shape[0]
+    larger = (sims >= observed).sum(axis = 0)
+    larger = np.where(permutations - larger < larger, permutations - larger, larger)
+    return (larger + 1.0) / (permutations + 1.0)
+
+
+# Description: Global Moran's I with a permutation test
+#              Permuted copies of y are processed as columns of a dense block, so each block
+#              is a single sparse-dense product W @ Z instead of one product per permutation.
+# Precondition: y is a 1-D array, w is an n x n scipy.sparse matrix
+# Returns a dict with I, EI (expected I), p_sim, z_sim and the simulated values
+def morans_i(y, w, permutations = 999, seed = None):
+    y = np.asarray(y, dtype = float)
+    w = sparse.csr_matrix(w)
+    n = len(y)
+    rng = np.random.default_rng(seed)
+
+    z = y - y.mean()
+    z_sq = z @ z
+    scale = n / w.sum()
+
+    I = scale * (z @ (w @ z)) / z_sq
+    result = {'I' : I, 'EI' : -1.0 / (n - 1)}
+
+    if permutations:
+        sims = np.empty(permutations)
+        block = max(1, min(permutations, PERMUTATION_BLOCK // n))
+        for start in range(0, permutations, block):
+            size = min(block, permutations - start)
+            # n x size matrix where every column is a shuffled z
+            Z = rng.permuted(np.broadcast_to(z[:, None], (n, size)), axis = 0)
+            sims[start:start + size] = scale * np.einsum('ij,ij->j', Z, w @ Z) / z_sq
+
+        result['sim'] = sims
+        result['p_sim'] = _pseudo_p(sims, I)
+        result['z_sim'] = (I - sims.mean()) / sims.std()
+
+    return result
+
+
+# Description: Local Moran's I (LISA) with a conditional permutation test
+#              For tract i, its neighbours' values are replaced by a random draw from the other
+#              n - 1 tracts. One table of random draws is shared by every tract (as in PySAL's esda),
+#              and tracts with the same number of neighbours are processed together, so the work
+#              is a handful of vectorized gathers over blocks of tracts.
+# Precondition: y is a 1-D array, w is an n x n scipy.sparse matrix
+# Returns a DataFrame with one row per tract: Is, p_sim, z_sim and the quadrant (1 HH, 2 LH, 3 LL, 4 HL)
+def local_morans_i(y, w, permutations = 999, seed = None):
+    y = np.asarray(y, dtype = float)
+    w = sparse.csr_matrix(w)
+    n = len(y)
+    rng = np.random.default_rng(seed)
+
+    z = y - y.mean()
+    m2 = (z @ z) / n
+    lag = w @ z
+    Is = z * lag / m2
+
+    # Quadrant of the Moran scatter plot
+    quadrant = np.where(z > 0, np.where(lag > 0, 1, 4), np.where(lag > 0, 2, 3))
+
+    result = pd.DataFrame({'Is' : Is, 'quadrant' : quadrant})
+    if not permutations:
+        return result
+
+    cardinality = np.diff(w.indptr)
+    max_k = cardinality.max()
+    p_sim = np.ones(n)
+    z_sim = np.zeros(n)
+
+    # Indices into "every tract except i", shared by all tracts
+    # index r maps to tract r if r < i, and r + 1 otherwise
+    draws = np.stack([rng.choice(n - 1, size = max_k, replace = False)
+                      for _ in range(permutations)])
+
+    for k in np.unique(cardinality):
+        if k == 0:
+            continue
+        tracts = np.flatnonzero(cardinality == k)
+        picks = draws[:, :k]
+
+        # Gather the weights of each tract's k neighbours, row by row as stored in the CSR matrix
+        starts = w.indptr[tracts]
+        weights = w.data[starts[:, None] + np.arange(k)]
+
+        block = max(1, PERMUTATION_BLOCK // (permutations * k))
+        for start in range(0, len(tracts), block):
+            ids = tracts[start:start + block]
+            shifted = picks[None, :, :] + (picks[None, :, :] >= ids[:, None, None])
+            lag_sim = np.einsum('bpk,bk->bp', z[shifted], weights[start:start + block])
+            sims = (z[ids, None] * lag_sim / m2).T
+
+            p_sim[ids] = _pseudo_p(sims, Is[ids])
+            z_sim[ids] = (Is[ids] - sims.mean(axis = 0)) / sims.std(axis = 0)
+
+    result['p_sim'] = p_sim
+    result['z_sim'] = z_sim
+    return result
+
+
+# Description: Fits the same log(crime_rate) OLS model as stats_analysis.py
+# Precondition: data is a crime_census GeoDataFrame
+# Returns the fitted statsmodels results
+def fit_ols(data):
+    X_vars = data[ols_cols].copy()
+    X_vars['one'] = np.ones(X_vars.shape[0])
+    return sm.OLS(np.log(data.crime_rate + 0.000001), X_vars).fit()
+
+
+# Precondition: crime_census is an optional dict of {city: GeoDataFrame} that was already loaded
+#               (e.g. by run_analysis.py), otherwise the crime_census_{city}.geojson files are read
+def main(crime_census=None):
+    cities = ['van', 'tor', 'mon']
+    permutations = 999
+    input_dir = pathlib.Path('crime_census')
+    output_dir = pathlib.Path('spatial_stats')
+    os.makedirs(output_dir, exist_ok=True)
+
+    for city in cities:
+        if crime_census is not None:
+            data = crime_census[city]
+        else:
+            data = gpd.read_file(input_dir / ('crime_census_' + city + '.geojson'))
+        data = project_tracts(data, city).reset_index(drop = True)
+
+        residuals = fit_ols(data).resid.values
+        weights = {'queen' : row_standardize(contiguity_weights(data.geometry)),
+                   'knn6' : row_standardize(knn_weights(data.geometry, k = 6))}
+
+        print(f"\nMoran's I for {city} ({len(data)} tracts, {permutations} permutations):")
+        for w_name, w in weights.items():
+            islands = int((np.diff(w.indptr) == 0).sum())
+            if islands:
+                print(f'  {w_name}: {islands} tracts without neighbours')
+
+            for y_name, y in [('crime_rate', data.crime_rate.values), ('ols_residuals', residuals)]:
+                moran = morans_i(y, w, permutations = permutations, seed = 353)
+                print('  ' + OUTPUT_TEMPLATE.format(label = f'{y_name} ({w_name})', **moran))
+
+                # Save the local statistics so clusters can be mapped
+                lisa = local_morans_i(y, w, permutations = permutations, seed = 353)
+                lisa.insert(0, 'name', data['name'].values)
+                lisa.to_csv(output_dir / f'lisa_{city}_{y_name}_{w_name}.csv', index = False)
+
+
+if __name__ == '__main__':
+    main()
@@ -24,13 +24,22 @@ import seaborn as sns
 from scipy import stats
 from statsmodels.stats.multicomp import pairwise_tukeyhsd
 import statsmodels.api as sm
+from data_processing import ols_cols
 
-def main():
+# Precondition: crime_census is an optional dict of {city: GeoDataFrame} that was already loaded
+#               (e.g. by run_analysis.py), otherwise the crime_census_{city}.geojson files are read
+def main(crime_census=None):
     # read files
-    input_dir = pathlib.Path('crime_census')
-    van = gpd.read_file(input_dir / 'crime_census_van.geojson')
-    tor = gpd.read_file(input_dir / 'crime_census_tor.geojson')
-    mon = gpd.read_file(input_dir / 'crime_census_mon.geojson')
+    if crime_census is not None:
+        # copy since columns are added below and the data is shared with other analyses
+        van = crime_census['van'].copy()
+        tor = crime_census['tor'].copy()
+        mon = crime_census['mon'].copy()
+    else:
+        input_dir = pathlib.Path('crime_census')
+        van = gpd.read_file(input_dir / 'crime_census_van.geojson')
+        tor = gpd.read_file(input_dir / 'crime_census_tor.geojson')
+        mon = gpd.read_file(input_dir / 'crime_census_mon.geojson')
 
     # take the log as the data is right-skewed
     van['crime_rate_log'] = np.log(van.crime_rate + 0.000001)
@@ -45,9 +54,7 @@ def main():
 
     # Regression model of vancouver
     # Variables for regression
-    X_vars = van[['pop_density', 'dropouts_to_grads', 'one_parent_to_two', 'crowded_to_not', 
-                  'non_minority_to_minority', 'male_to_female',
-                   'home_renters_to_owners', 'low_income_status_pct']].copy()
+    X_vars = van[ols_cols].copy()
 
     # Ones for intercept because sm.OLS doesn't include an intercept
     X_vars['one'] = np.ones(X_vars.shape[0])
@@ -24,11 +24,23 @@ import geopandas as gpd
 import numpy as np
 import folium
 from folium import Choropleth
+import crime_store
 
-def main():
+# Precondition: crimes_van is an optional DataFrame of crimedata_van.zip that was already loaded
+#               (e.g. by run_analysis.py), otherwise it is read from datasets
+def main(crimes_van=None):
     # Load the crime data
     input_dir = pathlib.Path('datasets')
-    data = pd.read_csv(input_dir / 'crimedata_van.zip', compression = 'zip')
+    if crimes_van is not None:
+        # copy since NEIGHBOURHOOD is modified below and the data is shared with the ETL
+        data = crimes_van.copy()
+    elif crime_store.has_city('van'):
+        # Only the two columns needed from the crime store (crime_store.py)
+        data = crime_store.read_crimes('van', years = [2021], columns = ['neighbourhood', 'year'])
+        data = data.rename(columns = {'neighbourhood' : 'NEIGHBOURHOOD', 'year' : 'YEAR'})
+        data['NEIGHBOURHOOD'] = data['NEIGHBOURHOOD'].astype(object)
+    else:
+        data = pd.read_csv(input_dir / 'crimedata_van.zip', compression = 'zip')
 
     # Rename {Central Business District: Downtown, Musqueam: Dunbar Southlands}
     data['NEIGHBOURHOOD'] = data['NEIGHBOURHOOD'].replace({